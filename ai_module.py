@@ -1,93 +1,85 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import List, Union
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
+
+from cache_module import get_cache, make_cache_key
+from prompt_module import registry
+from scheduler_module import scheduler
 
 # .env dosyasındaki API anahtarını yükle
 load_dotenv()
 openai_api_key = os.getenv("OPENAI_API_KEY")
+AI_MODEL = os.getenv("AI_MODEL", "gpt-4o")
+# Aynı prompt için üretilen yanıtların paylaşılan önbellekte kalma süresi (sn); 0 = süresiz, -1 = kapalı.
+# Varsayılan kapalı: açıklamaların her öğrenci için özgün olması beklenir, önbellek
+# aynı girdiler için kelimesi kelimesine aynı metni döndürür.
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", -1))
 
 # GPT-4o modelini tanımla
 llm = ChatOpenAI(
     temperature=0.7,
-    model="gpt-4o",  
+    model=AI_MODEL,
     openai_api_key=openai_api_key
 )
 
 # -------------------------------------------------------------------------
 # 1. Temel AI çağrı fonksiyonu (string döndürür)
 # -------------------------------------------------------------------------
-def get_ai_response(prompt: str) -> str:
-    return llm.invoke(prompt).content  # ✨ HATA BURADAYDI
+def invoke_llm(prompt: str) -> str:
+    # Kabul (öncelik kuyruğu) endpoint'te yapılır; burada kota kontrol edilip
+    # gerçek kullanım kiracıya işlenir
+    scheduler.check_quota()
+    message = llm.invoke(prompt)
+    scheduler.record_usage((message.usage_metadata or {}).get("total_tokens", 0))
+    return message.content  # ✨ HATA BURADAYDI
+
+
+def invoke_llm_batch(prompts: List[str], max_concurrency: int = 8,
+                     return_exceptions: bool = False) -> List[Union[str, Exception]]:
+    # Toplu iş yolu: istekler tek seferde langchain batch ile gönderilir;
+    # return_exceptions=True ise başarısız istekler hata nesnesi olarak döner
+    scheduler.check_quota()
+    messages = llm.batch(prompts, config={"max_concurrency": max_concurrency},
+                         return_exceptions=return_exceptions)
+    succeeded = [m for m in messages if not isinstance(m, Exception)]
+    scheduler.record_usage(sum((m.usage_metadata or {}).get("total_tokens", 0) for m in succeeded))
+    return [m if isinstance(m, Exception) else m.content for m in messages]
+
+
+def get_ai_response(prompt: str, prompt_version: str = "") -> str:
+    # Yanıtlar tüm worker'lar arasında paylaşılan önbellekten sunulur;
+    # anahtar prompt sürümünü içerdiği için şablon değişince önbellek geçersizleşir
+    if AI_CACHE_TTL < 0:
+        return invoke_llm(prompt)
+    cache = get_cache()
+    key = make_cache_key("ai", AI_MODEL, prompt_version, prompt)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    content = invoke_llm(prompt)
+    cache.set(key, content, ttl=AI_CACHE_TTL)
+    return content
 
 # -------------------------------------------------------------------------
 # 2. Basit Rapor Şablonu (Örnek)
 # -------------------------------------------------------------------------
-student_report_template = """
-Öğrencinin {ders_adı} dersi için gelişim raporunu hazırlayın.
-Öğrencinin güçlü yönleri: {guclu_yonler}.
-Geliştirilmesi gereken alanlar: {gelisim_alanlari}.
-Öneriler: {oneriler}.
-Ayrıntılı, kapsamlı ve yapılandırılmış bir rapor oluşturun.
-"""
-
-prompt_template = PromptTemplate(
-    input_variables=["ders_adı", "guclu_yonler", "gelisim_alanlari", "oneriler"],
-    template=student_report_template
-)
-
+# Şablonlar prompt_module kayıt defterinden bir kez derlenmiş olarak alınır
 def generate_student_report(ders_adı: str, guclu_yonler: str, gelisim_alanlari: str, oneriler: str) -> str:
-    formatted_prompt = prompt_template.format(
+    prompt = registry.get("student_report")
+    formatted_prompt = prompt.render(
         ders_adı=ders_adı,
         guclu_yonler=guclu_yonler,
         gelisim_alanlari=gelisim_alanlari,
         oneriler=oneriler
     )
-    return llm.invoke(formatted_prompt).content
+    return get_ai_response(formatted_prompt, prompt.tag)
 
 # -------------------------------------------------------------------------
 # 3. Zenginleştirilmiş Rapor Şablonu
 # -------------------------------------------------------------------------
-enriched_report_template = """
-Sen bir eğitim uzmanısın. Elinde bir öğrencinin farklı alanlarda değerlendirme verileri bulunuyor. 
-Bu verileri kullanarak, öğrenciye dair kapsamlı, pedagojik ve yapıcı bir rapor hazırlayacaksın.
-
-Değerlendirme, öğrencinin akademik, sosyal, duygusal ve kişisel gelişimiyle ilgili verileri içeriyor.
-Bu verileri kullanarak öğrencinin güçlü yanlarını, gelişim fırsatlarını ve geleceğe dönük önerileri belirt.
-
-Öncelikli Pedagojik İlkeler:
-- Öğrencinin adı geçmeyecek.
-- Negatif alanları ‘gelişime açık yönler’ olarak ifade et; aşırı övgü veya kesin yargılardan kaçın.
-- Vereceğin öneriler somut, gerçekçi ve eğitim bilimine uygun olsun.
-
-Rapor Formatı:
-1) Genel Durum Özeti (kısa bir giriş)
-2) Akademik Değerlendirme
-3) Sosyal ve Duygusal Gelişim
-4) Beceri Değerlendirmesi
-5) Kişisel Gelişim ve Motivasyon
-6) Öğrencinin İlgi Alanları
-7) Öneriler ve Sonuç (hem öğrenci hem de gerektiğinde öğretmen/veli için)
-
-Her önerinin neden faydalı olduğunu, mümkün olduğunca kısa bir açıklamayla belirt.
-Akademik fakat anlaşılır bir dil kullan; terminoloji gerekiyorsa tanımlayarak açıkla.
-
----
-Elimizdeki veriler:
-- Akademik Performans: {akademik_veri}
-- Sosyal ve Duygusal Gelişim: {sosyal_veri}
-- Beceri Değerlendirmesi: {beceri_veri}
-- Kişisel Gelişim/Motivasyon: {kisisel_veri}
-- İlgi Alanları: {ilgi_veri}
-
-Lütfen yukarıdaki maddeleri dikkate alarak kapsamlı bir rapor hazırla.
-"""
-
-enriched_prompt_template = PromptTemplate(
-    input_variables=["akademik_veri", "sosyal_veri", "beceri_veri", "kisisel_veri", "ilgi_veri"],
-    template=enriched_report_template
-)
-
 def generate_enriched_student_report(
     akademik_veri: str,
     sosyal_veri: str,
@@ -95,17 +87,79 @@ def generate_enriched_student_report(
     kisisel_veri: str,
     ilgi_veri: str
 ) -> str:
-    formatted_prompt = enriched_prompt_template.format(
+    prompt = registry.get("enriched_report")
+    formatted_prompt = prompt.render(
         akademik_veri=akademik_veri,
         sosyal_veri=sosyal_veri,
         beceri_veri=beceri_veri,
         kisisel_veri=kisisel_veri,
         ilgi_veri=ilgi_veri
     )
-    return llm.invoke(formatted_prompt).content
+    return get_ai_response(formatted_prompt, prompt.tag)
+
+# -------------------------------------------------------------------------
+# 4. Zenginleştirilmiş Rapor – Bölüm Bazlı Paralel Üretim
+# -------------------------------------------------------------------------
+# (başlık, odak, kullanılan veri alanları); None = tüm veriler
+ENRICHED_SECTIONS = [
+    ("Genel Durum Özeti", "Kısa bir giriş; öğrencinin genel tablosunu özetle.", None),
+    ("Akademik Değerlendirme", "Akademik performans ve öğrenme özellikleri.", ["akademik_veri"]),
+    ("Sosyal ve Duygusal Gelişim", "Akran ilişkileri, duygusal olgunluk ve sosyal farkındalık.", ["sosyal_veri"]),
+    ("Beceri Değerlendirmesi", "Problem çözme, iletişim ve diğer beceriler.", ["beceri_veri"]),
+    ("Kişisel Gelişim ve Motivasyon", "Motivasyon, hedef belirleme ve öz düzenleme.", ["kisisel_veri"]),
+    ("Öğrencinin İlgi Alanları", "İlgi alanları ve bunların gelişime katkısı.", ["ilgi_veri"]),
+    ("Öneriler ve Sonuç",
+     "Öğrenci ve gerektiğinde öğretmen/veli için somut öneriler; her önerinin neden faydalı olduğunu kısaca belirt.",
+     None),
+]
+
+ENRICHED_DATA_LABELS = {
+    "akademik_veri": "Akademik Performans",
+    "sosyal_veri": "Sosyal ve Duygusal Gelişim",
+    "beceri_veri": "Beceri Değerlendirmesi",
+    "kisisel_veri": "Kişisel Gelişim/Motivasyon",
+    "ilgi_veri": "İlgi Alanları",
+}
+
+
+def generate_enriched_student_report_parallel(
+    akademik_veri: str,
+    sosyal_veri: str,
+    beceri_veri: str,
+    kisisel_veri: str,
+    ilgi_veri: str
+) -> str:
+    # Yedi bölüm ayrı ve kısa tamamlamalar olarak eşzamanlı üretilip birleştirilir;
+    # toplam süre en uzun bölüm kadardır
+    data = {
+        "akademik_veri": akademik_veri,
+        "sosyal_veri": sosyal_veri,
+        "beceri_veri": beceri_veri,
+        "kisisel_veri": kisisel_veri,
+        "ilgi_veri": ilgi_veri,
+    }
+    prompt = registry.get("enriched_section")
+    prompts = []
+    for title, focus, fields in ENRICHED_SECTIONS:
+        veriler = "\n".join(
+            f"- {ENRICHED_DATA_LABELS[field]}: {data[field]}" for field in (fields or data)
+        )
+        prompts.append(prompt.render(section=title, focus=focus, veriler=veriler))
+
+    with ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+        # İstek bağlamı (ör. kiracı bilgisi) her thread'e taşınır
+        futures = [
+            executor.submit(copy_context().run, get_ai_response, p, prompt.tag) for p in prompts
+        ]
+        sections = [future.result() for future in futures]
+
+    return "\n\n".join(
+        f"{index}) {title}\n{content.strip()}"
+        for index, ((title, _, _), content) in enumerate(zip(ENRICHED_SECTIONS, sections), start=1)
+    )
 
 # -------------------------------------------------------------------------
-# 4. Test amaçlı çalıştırma
+# 5. Test amaçlı çalıştırma
 # -------------------------------------------------------------------------
 if __name__ == "__main__":
     rapor_basit = generate_student_report(
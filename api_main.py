@@ -1,21 +1,110 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.requests import ClientDisconnect
+from pydantic import BaseModel, Field, ValidationError
+from typing import Optional
 from datetime import datetime
-from typing import Dict, List
+import json
 from uuid import uuid4
 
 # Auth ve Google giriş
-from auth import router as auth_router
+from auth import router as auth_router, decode_access_token, tenant_from_claims, require_admin
 from google_auth import router as google_auth_router
 
 # Rapor modelleri ve işleyiciler
-from report_module import Student, Assessment, process_assessment
+from report_module import (
+    Student, Assessment, process_assessment, load_question_definitions, generate_enriched_report
+)
+
+# İstek boyutu sınırları ve toplu yükleme ayrıştırıcısı
+from limits_module import (
+    BodySizeLimitMiddleware, LineTooLongError, NDJSONStreamingResponse, RequestBodyStream, iter_ndjson_lines,
+    ShortStr, TextStr, ShortStrList, ResponseMap, MAX_BODY_BYTES, MAX_BULK_BODY_BYTES
+)
+
+# İsteğe bağlı örneklemeli profil alma
+from profiling_module import ProfilingMiddleware, profiler
+
+# Çevrimdışı üretilmiş açıklama kütüphanesi
+from description_library import load_description_library
+
+# Paylaşılan önbellek (tüm worker'lar ortak kullanır)
+from cache_module import get_cache, close_cache
+
+# LLM zamanlayıcısı (kiracı kotaları ve öncelik kuyruğu)
+from scheduler_module import (
+    scheduler, current_tenant, current_priority, PRIORITY_CLASSES,
+    QuotaExceededError, QueueTimeoutError, PRIORITY_BATCH, LLM_JOB_TOKEN_ESTIMATE,
+    load_usage, persist_usage, publish_worker_snapshot, load_cluster_snapshot
+)
+
+logger = logging.getLogger(__name__)
+
+# Kullanım sayaçlarının Mongo'ya yazılma aralığı (sn)
+USAGE_FLUSH_SECONDS = float(os.getenv("USAGE_FLUSH_SECONDS", 15))
+
+
+async def _flush_usage_periodically():
+    while True:
+        await asyncio.sleep(USAGE_FLUSH_SECONDS)
+        try:
+            await persist_usage()
+            await publish_worker_snapshot()
+        except Exception as e:
+            logger.warning(f"LLM kullanım kayıtları yazılamadı: {e}")
+
+
+# Uygulama yaşam döngüsü: her worker başlarken önbellekte süresi dolan kayıtları temizler,
+# soru tanımlarını ve açıklama kütüphanesini belleğe yükler; kapanırken önbelleği diske yazar
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    cache = get_cache()
+    await run_in_threadpool(cache.purge_expired)
+    load_question_definitions()
+    library = load_description_library()
+    if library is None:
+        logger.info("Açıklama kütüphanesi bulunamadı; açıklamalar canlı üretilecek.")
+    else:
+        logger.info(f"Açıklama kütüphanesi yüklendi: {library.prompt_version} ({len(library)} yanıt)")
+    try:
+        await asyncio.wait_for(load_usage(), timeout=5)
+    except Exception as e:
+        logger.warning(f"LLM kullanım kayıtları yüklenemedi: {e}")
+    flusher = asyncio.create_task(_flush_usage_periodically())
+    profiler.start_config_watcher()
+    yield
+    flusher.cancel()
+    await run_in_threadpool(profiler.stop_config_watcher)
+    try:
+        await asyncio.wait_for(persist_usage(), timeout=5)
+    except Exception as e:
+        logger.warning(f"LLM kullanım kayıtları yazılamadı: {e}")
+    await run_in_threadpool(close_cache)
+
 
-# FastAPI uygulaması
-app = FastAPI()
+# FastAPI uygulaması (tek giriş noktası: main.py bu uygulamayı çalıştırır)
+app = FastAPI(lifespan=lifespan)
 
-# CORS ayarları (Framer için açık)
+# Middleware'ler eklenme sırasının tersiyle sarılır (son eklenen en dıştadır)
+
+# Gövde boyutu sınırı (toplu yükleme ucu daha yüksek sınırla akış olarak okunur)
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_body_bytes=MAX_BODY_BYTES,
+    path_limits={"/student-full-report/bulk": MAX_BULK_BODY_BYTES}
+)
+
+# Profil alma (varsayılan kapalı; /admin/profiling ile çalışma anında açılır)
+app.add_middleware(ProfilingMiddleware)
+
+# CORS ayarları (Framer için açık); en dışta olmalı ki erken dönen yanıtlar
+# (ör. 413) da CORS başlıklarını taşısın
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -29,45 +118,116 @@ app.include_router(auth_router)
 app.include_router(google_auth_router, prefix="/auth/google", tags=["Google Auth"])
 
 
+@app.exception_handler(QuotaExceededError)
+async def quota_exceeded_handler(request: Request, exc: QuotaExceededError):
+    return JSONResponse(status_code=429, content={"detail": str(exc)})
+
+
+@app.exception_handler(QueueTimeoutError)
+async def queue_timeout_handler(request: Request, exc: QueueTimeoutError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "10"})
+
+
+# LLM çağrıları için kiracı ve öncelik bağlamı (JWT sub / alan adı, X-Job-Class başlığı);
+# geçerli token olmadan LLM uçları 401 döner
+async def llm_context(request: Request) -> str:
+    tenant = tenant_from_claims(decode_access_token(request))
+    job_class = request.headers.get("X-Job-Class", "interactive").lower()
+    current_tenant.set(tenant)
+    current_priority.set(PRIORITY_CLASSES.get(job_class, PRIORITY_CLASSES["interactive"]))
+    return tenant
+
+
+@app.get("/health", tags=["Sistem"])
+async def health():
+    return {"status": "ok", "cache": await run_in_threadpool(get_cache().stats)}
+
+
+@app.get("/admin/llm-usage", tags=["Yönetim"])
+async def llm_usage(admin: str = Depends(require_admin)):
+    # "worker": yanıtı veren worker'ın canlı durumu; "cluster": tüm worker'ların
+    # Mongo'ya yayınladığı son durumlar ve bugünkü toplam kullanım
+    response = {"worker": scheduler.snapshot(), "cluster": None}
+    try:
+        response["cluster"] = await asyncio.wait_for(
+            load_cluster_snapshot(max_age_seconds=3 * USAGE_FLUSH_SECONDS), timeout=5
+        )
+    except Exception as e:
+        logger.warning(f"Worker durumları okunamadı: {e}")
+    return response
+
+
+class ProfilingConfig(BaseModel):
+    enabled: bool
+    sample_rate: float = Field(1.0, gt=0, le=1)
+    route: Optional[str] = None
+    interval_ms: float = Field(5.0, ge=1, le=1000)
+
+@app.get("/admin/profiling", tags=["Yönetim"])
+async def profiling_status(admin: str = Depends(require_admin)):
+    return profiler.status()
+
+@app.post("/admin/profiling", tags=["Yönetim"])
+async def configure_profiling(config: ProfilingConfig, admin: str = Depends(require_admin)):
+    # Ayar paylaşılan önbelleğe yazılır; diğer worker'lar birkaç saniye içinde uygular
+    return await run_in_threadpool(
+        profiler.configure, config.enabled, config.sample_rate, config.route, config.interval_ms
+    )
+
+@app.get("/admin/profiling/flamegraph", tags=["Yönetim"], response_class=PlainTextResponse)
+async def profiling_flamegraph(route: Optional[str] = None, admin: str = Depends(require_admin)):
+    # Folded stack çıktısı (bu worker'ın örnekleri): flamegraph.pl / speedscope ile açılır.
+    # Uç bazlı örnekler yalnızca o istek tek başına işlenirken alınır; "*" süreç genelidir.
+    return PlainTextResponse(profiler.folded(route), headers={"X-Worker-Pid": str(os.getpid())})
+
+@app.delete("/admin/profiling", tags=["Yönetim"])
+async def reset_profiling(admin: str = Depends(require_admin)):
+    profiler.reset()
+    return profiler.status()
+
+
 # =============================
 # Basit AI destekli rapor
 # =============================
-from ai_module import generate_student_report
+from ai_module import generate_student_report, ENRICHED_SECTIONS
+from prompt_module import registry
 
 class SimpleReportRequest(BaseModel):
-    ders_adı: str
-    guclu_yonler: str
-    gelisim_alanlari: str
-    oneriler: str
+    ders_adı: ShortStr
+    guclu_yonler: TextStr
+    gelisim_alanlari: TextStr
+    oneriler: TextStr
 
 @app.post("/generate-report", tags=["Basit AI Rapor"])
-async def generate_simple_report(request: SimpleReportRequest):
-    rapor = generate_student_report(
-        ders_adı=request.ders_adı,
-        guclu_yonler=request.guclu_yonler,
-        gelisim_alanlari=request.gelisim_alanlari,
-        oneriler=request.oneriler
-    )
-    return {"rapor": rapor.content}
+async def generate_simple_report(request: SimpleReportRequest, tenant: str = Depends(llm_context)):
+    async with scheduler.admit():
+        rapor = await run_in_threadpool(
+            generate_student_report,
+            ders_adı=request.ders_adı,
+            guclu_yonler=request.guclu_yonler,
+            gelisim_alanlari=request.gelisim_alanlari,
+            oneriler=request.oneriler
+        )
+    return {"rapor": rapor, "prompt_version": registry.get("student_report").tag}
 
 
 # =============================
 # Tam AI destekli öğrenci değerlendirmesi
 # =============================
 class FullReportRequest(BaseModel):
-    name: str
-    surname: str
-    birth_date: str
-    grade: str
-    age_group: str
-    interests: List[str]
-    learning_style: List[str]
-    assessor_name: str
-    assessor_role: str
-    responses: Dict[str, Dict[str, str]]
+    name: ShortStr
+    surname: ShortStr
+    birth_date: ShortStr
+    grade: ShortStr
+    age_group: ShortStr
+    interests: ShortStrList
+    learning_style: ShortStrList
+    assessor_name: ShortStr
+    assessor_role: ShortStr
+    responses: ResponseMap
 
-@app.post("/student-full-report", tags=["AI Raporlama"])
-async def student_full_report(request: FullReportRequest):
+
+def build_student_and_assessment(request: FullReportRequest):
     # Öğrenci nesnesi oluştur
     student = Student(
         student_id=str(uuid4()),
@@ -89,10 +249,13 @@ async def student_full_report(request: FullReportRequest):
         date=datetime.now().strftime("%Y-%m-%d")
     )
 
-    for category, subcats in request.responses.items():
-        for subcat, answer in subcats.items():
-            assessment.add_response(category, subcat, answer)
+    # Doğrulanmış yanıtlar kopyalanmadan devralınır
+    assessment.responses = request.responses
 
+    return student, assessment
+
+def build_full_report(request: FullReportRequest) -> dict:
+    student, assessment = build_student_and_assessment(request)
     results = process_assessment(assessment, student)
 
     # Circular import'u önlemek için burada çağırıyoruz
@@ -104,3 +267,69 @@ async def student_full_report(request: FullReportRequest):
         "assessment": assessment.to_dict(),
         "report": report.to_dict()
     }
+
+@app.post("/student-full-report", tags=["AI Raporlama"])
+async def student_full_report(request: FullReportRequest, tenant: str = Depends(llm_context)):
+    async with scheduler.admit():
+        return await run_in_threadpool(build_full_report, request)
+
+
+# Toplu yükleme: her satırı bir FullReportRequest olan NDJSON gövdesi akış olarak
+# işlenir; bellekte aynı anda yalnızca bir kayıt bulunur, sonuçlar da satır satır döner.
+@app.post("/student-full-report/bulk", tags=["AI Raporlama"])
+async def student_full_report_bulk(request: Request, tenant: str = Depends(llm_context)):
+    current_priority.set(PRIORITY_BATCH)
+
+    async def results():
+        body = RequestBodyStream(request)
+        try:
+            async for line_no, line in iter_ndjson_lines(body):
+                # İstemci gittiyse kalan kayıtlar için model çağrısı yapılmaz
+                if await body.is_disconnected():
+                    return
+                try:
+                    item = FullReportRequest.model_validate_json(line)
+                    async with scheduler.admit():
+                        result = await run_in_threadpool(build_full_report, item)
+                    record = {"line": line_no, "result": result}
+                except ValidationError as e:
+                    record = {"line": line_no, "error": e.errors(include_url=False, include_input=False)}
+                except QuotaExceededError as e:
+                    yield json.dumps({"line": line_no, "error": str(e)}, ensure_ascii=False) + "\n"
+                    return
+                except Exception as e:
+                    # Tek kaydın hatası (ör. model bağlantı/oran sınırı) akışı kesmez
+                    logger.warning(f"Toplu yükleme {line_no}. satır işlenemedi: {e!r}")
+                    record = {"line": line_no, "error": f"{type(e).__name__}: {e}"}
+                yield json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        except ClientDisconnect:
+            return
+        except (LineTooLongError, HTTPException) as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            yield json.dumps({"error": detail}, ensure_ascii=False) + "\n"
+
+    return NDJSONStreamingResponse(results())
+
+
+# =============================
+# Zenginleştirilmiş AI raporu
+# =============================
+class EnrichedReportRequest(FullReportRequest):
+    # True: yedi bölüm ayrı kısa tamamlamalar olarak paralel üretilir
+    parallel: bool = False
+
+@app.post("/student-enriched-report", tags=["AI Raporlama"])
+async def student_enriched_report(request: EnrichedReportRequest, tenant: str = Depends(llm_context)):
+    student, assessment = build_student_and_assessment(request)
+
+    # Paralel modda bölümler aynı anda üretilir; her bölüm bir eşzamanlılık yuvası
+    # ve bir iş tahmini kadar yer ayırır
+    calls = len(ENRICHED_SECTIONS) if request.parallel else 1
+    async with scheduler.admit(tokens=LLM_JOB_TOKEN_ESTIMATE * calls, slots=calls):
+        report = await run_in_threadpool(generate_enriched_report, student, assessment, request.parallel)
+
+    return {
+        "student": student.to_dict(),
+        "assessment": assessment.to_dict(),
+        "report": report.to_dict()
+    }
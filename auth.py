@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from pydantic import BaseModel, EmailStr
@@ -17,6 +17,10 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
+# Kiracı belirleme: "domain" (e-posta alan adı, okul bazında) veya "sub" (kullanıcı bazında)
+TENANT_BY = os.getenv("TENANT_BY", "domain")
+# Yönetici uçlarına erişebilecek e-postalar (virgülle ayrılmış)
+ADMIN_EMAILS = {e.strip() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
 
 # -------------------------------
 # ŞEMA TANIMLARI
@@ -77,3 +81,34 @@ def create_access_token(data: dict):
     to_encode = data.copy()
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+# -------------------------------
+# JWT Token Çözümle
+# -------------------------------
+
+def decode_access_token(request: Request) -> dict:
+    authorization = request.headers.get("Authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return {}
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Geçersiz token.")
+
+
+def tenant_from_claims(claims: dict) -> str:
+    # LLM uçları kimliksiz çağrılamaz; aksi halde kota atlanabilirdi
+    subject = claims.get("sub")
+    if not subject:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Geçerli bir token gerekli.")
+    if TENANT_BY == "domain" and "@" in subject:
+        return subject.rsplit("@", 1)[1].lower()
+    return subject
+
+
+async def require_admin(request: Request) -> str:
+    subject = decode_access_token(request).get("sub")
+    if not subject or subject not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Yetkisiz erişim.")
+    return subject
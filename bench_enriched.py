@@ -0,0 +1,68 @@
+import argparse
+import os
+import time
+
+# Ölçümde önbellek devre dışı; her çağrı gerçekten modele gider
+os.environ["AI_CACHE_TTL"] = "-1"
+
+from langchain_community.callbacks import get_openai_callback
+
+from report_module import Student, Assessment, build_enriched_inputs
+from ai_module import generate_enriched_student_report, generate_enriched_student_report_parallel
+
+# Zenginleştirilmiş raporun tek parça ve bölüm bazlı paralel üretimini karşılaştırır:
+#   python bench_enriched.py --runs 3
+# Gerçek OPENAI_API_KEY gerektirir.
+
+
+def sample_inputs():
+    student = Student("S001", "Zeynep", "Demir", "2011-03-12", "5. Sınıf", "primary")
+    student.interests = ["Sanat ve El Becerileri", "Müzik ve Performans"]
+    student.learning_style = ["Görsel", "İşitsel"]
+
+    assessment = Assessment("A001", student.student_id, "Mehmet Öğretmen", "teacher", "2025-04-08")
+    assessment.add_response("academic", "performance", "Beklentilerin üzerinde")
+    assessment.add_response("academic", "learning_speed", "Hızlı")
+    assessment.add_response("skills", "problem_solving", "Yetkin")
+    assessment.add_response("skills", "communication", "Etkili")
+    assessment.add_response("social_emotional", "peer_relationships", "Orta")
+    assessment.add_response("social_emotional", "emotional_maturity", "Yüksek")
+    assessment.add_response("personal_development", "motivation_interest", "Yüksek")
+    assessment.add_response("interests", "student_interests", "Sanat ve El Becerileri")
+    return build_enriched_inputs(assessment, student)
+
+
+def measure(fn, inputs, runs: int) -> dict:
+    durations, prompt_tokens, completion_tokens, cost = [], 0, 0, 0.0
+    for _ in range(runs):
+        with get_openai_callback() as cb:
+            started = time.perf_counter()
+            fn(**inputs)
+            durations.append(time.perf_counter() - started)
+        prompt_tokens += cb.prompt_tokens
+        completion_tokens += cb.completion_tokens
+        cost += cb.total_cost
+    return {
+        "seconds": sum(durations) / runs,
+        "prompt_tokens": prompt_tokens / runs,
+        "completion_tokens": completion_tokens / runs,
+        "cost_usd": cost / runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tek parça / paralel zenginleştirilmiş rapor karşılaştırması")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    inputs = sample_inputs()
+    print(f"{'mod':>10} {'süre sn':>9} {'girdi tok':>10} {'çıktı tok':>10} {'maliyet $':>10}")
+    for name, fn in (("single", generate_enriched_student_report),
+                     ("parallel", generate_enriched_student_report_parallel)):
+        r = measure(fn, inputs, args.runs)
+        print(f"{name:>10} {r['seconds']:>9.2f} {r['prompt_tokens']:>10.0f} "
+              f"{r['completion_tokens']:>10.0f} {r['cost_usd']:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Ortam değişkenleri
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite")  # sqlite | mongo | none
+CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(os.path.dirname(__file__), "cache", "egitim_ai_cache.sqlite3"))
+CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", 7 * 24 * 3600))
+
+# ============================================================================
+# YARDIMCILAR
+# ============================================================================
+
+def make_cache_key(namespace: str, *parts: Any) -> str:
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return f"{namespace}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+def _expires_at(ttl: Optional[int]) -> Optional[float]:
+    if ttl is None:
+        ttl = CACHE_DEFAULT_TTL
+    return time.time() + ttl if ttl > 0 else None
+
+# ============================================================================
+# SQLITE ÖNBELLEK (tek makinede tüm worker'lar arasında paylaşılır)
+# ============================================================================
+
+class SQLiteCache:
+    # WAL modu sayesinde birden çok uvicorn/gunicorn worker'ı aynı dosyayı
+    # aynı anda okuyabilir; yazmalar busy_timeout ile sıraya girer.
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL"
+            ")"
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            self.delete(key)
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, payload, _expires_at(ttl))
+            )
+
+    def set_many(self, items: Iterable[Tuple[str, Any]], ttl: Optional[int] = None) -> None:
+        expires_at = _expires_at(ttl)
+        rows = [(k, json.dumps(v, ensure_ascii=False), expires_at) for k, v in items]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)", rows
+            )
+            self._conn.execute("COMMIT")
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+            )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        return {"backend": "sqlite", "path": self.path, "entries": count}
+
+    def flush(self) -> None:
+        # WAL içeriğini ana dosyaya yaz; yeniden başlatmada kayıp olmasın
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+# ============================================================================
+# MONGO ÖNBELLEK (birden çok makine arasında paylaşılır)
+# ============================================================================
+
+class MongoCache:
+    # İstekler thread havuzunda çalıştığı için senkron pymongo istemcisi kullanılır
+    def __init__(self, uri: Optional[str] = None, collection: str = "cache"):
+        from pymongo import MongoClient
+
+        self._client = MongoClient(uri or os.getenv("MONGODB_URI"))
+        self._collection = self._client["egitim_ai_db"][collection]
+        # expires_at alanı dolan kayıtları Mongo kendisi siler
+        self._collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def get(self, key: str) -> Optional[Any]:
+        doc = self._collection.find_one({"_id": key})
+        if doc is None:
+            return None
+        expires_at = doc.get("expires_at")
+        if expires_at is not None and expires_at.timestamp() < time.time():
+            return None
+        return doc["value"]
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        self._collection.replace_one({"_id": key}, self._document(value, ttl), upsert=True)
+
+    def set_many(self, items: Iterable[Tuple[str, Any]], ttl: Optional[int] = None) -> None:
+        from pymongo import ReplaceOne
+
+        operations = [ReplaceOne({"_id": k}, self._document(v, ttl), upsert=True) for k, v in items]
+        if operations:
+            self._collection.bulk_write(operations, ordered=False)
+
+    def delete(self, key: str) -> None:
+        self._collection.delete_one({"_id": key})
+
+    def purge_expired(self) -> int:
+        # TTL index temizliği Mongo tarafından yapılır
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "mongo", "entries": self._collection.estimated_document_count()}
+
+    def flush(self) -> None:
+        # Yazmalar anında kalıcı; yapılacak bir şey yok
+        pass
+
+    def close(self) -> None:
+        self._client.close()
+
+    @staticmethod
+    def _document(value: Any, ttl: Optional[int]) -> Dict[str, Any]:
+        from datetime import datetime, timezone
+
+        expires_at = _expires_at(ttl)
+        return {
+            "value": value,
+            "expires_at": datetime.fromtimestamp(expires_at, tz=timezone.utc) if expires_at else None
+        }
+
+# ============================================================================
+# DEVRE DIŞI ÖNBELLEK
+# ============================================================================
+
+class NullCache:
+    def get(self, key: str) -> Optional[Any]:
+        return None
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        pass
+
+    def set_many(self, items: Iterable[Tuple[str, Any]], ttl: Optional[int] = None) -> None:
+        pass
+
+    def delete(self, key: str) -> None:
+        pass
+
+    def purge_expired(self) -> int:
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "none", "entries": 0}
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+# ============================================================================
+# SÜREÇ BAŞINA TEK ÖRNEK
+# ============================================================================
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    # Her worker süreci kendi bağlantısını açar; veri arka uçta paylaşılır
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if CACHE_BACKEND == "mongo":
+                    _cache = MongoCache()
+                elif CACHE_BACKEND == "none":
+                    _cache = NullCache()
+                else:
+                    _cache = SQLiteCache()
+    return _cache
+
+
+def close_cache() -> None:
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+            _cache = None
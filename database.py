@@ -7,3 +7,5 @@ load_dotenv()
 client = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGODB_URI"))
 db = client["egitim_ai_db"]
 users_collection = db["users"]
+llm_usage_collection = db["llm_usage"]
+llm_workers_collection = db["llm_workers"]
@@ -0,0 +1,249 @@
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from prompt_module import registry
+
+load_dotenv()
+
+# Kütüphane dosyalarının bulunduğu dizin; dosya adı prompt sürüm etiketinden türetilir
+DESCRIPTION_LIBRARY_DIR = os.getenv(
+    "DESCRIPTION_LIBRARY_DIR", os.path.join(os.path.dirname(__file__), "descriptions")
+)
+LIBRARY_PROMPT = "description_offline"
+
+# Dosya biçimi: MAGIC | uint32 dizin uzunluğu | JSON dizin | UTF-8 metin bloğu
+# Dizin her (kategori, alt kategori, yanıt) için metin bloğundaki [offset, uzunluk] listesini tutar.
+MAGIC = b"EDL1"
+_HEADER = struct.Struct("<4sI")
+_KEY_SEPARATOR = "\x1f"
+
+# ============================================================================
+# KÜTÜPHANE
+# ============================================================================
+
+def make_key(category: str, subcategory: str, response: str) -> str:
+    return _KEY_SEPARATOR.join((category, subcategory, response))
+
+
+def library_path(prompt_tag: str, directory: str = DESCRIPTION_LIBRARY_DIR) -> str:
+    return os.path.join(directory, re.sub(r"[^A-Za-z0-9_.@+-]", "_", prompt_tag) + ".edl")
+
+
+class DescriptionLibrary:
+    # Metinler belleğe kopyalanmaz; mmap üzerinden yalnızca istenen dilim çözülür
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_length = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Geçersiz açıklama kütüphanesi: {path}")
+        index = json.loads(self._mmap[_HEADER.size:_HEADER.size + index_length])
+        self._base = _HEADER.size + index_length
+        self.meta: Dict[str, Any] = index["meta"]
+        self._entries: Dict[str, List[List[int]]] = index["entries"]
+
+    @property
+    def prompt_version(self) -> str:
+        return self.meta["prompt_version"]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def variants(self, category: str, subcategory: str, response: str) -> int:
+        return len(self._entries.get(make_key(category, subcategory, response), ()))
+
+    def lookup(self, category: str, subcategory: str, response: str, seed: str = "") -> Optional[str]:
+        key = make_key(category, subcategory, response)
+        spans = self._entries.get(key)
+        if not spans:
+            return None
+        # Aynı değerlendirme için aynı varyant, farklı öğrenciler için farklı varyant
+        offset, length = spans[zlib.crc32(f"{seed}{_KEY_SEPARATOR}{key}".encode("utf-8")) % len(spans)]
+        start = self._base + offset
+        return self._mmap[start:start + length].decode("utf-8")
+
+    def close(self) -> None:
+        self._mmap.close()
+
+
+def write_library(path: str, entries: Dict[str, List[str]], meta: Dict[str, Any]) -> None:
+    blob = bytearray()
+    index: Dict[str, List[List[int]]] = {}
+    for key, texts in entries.items():
+        spans = []
+        for text in texts:
+            data = text.strip().encode("utf-8")
+            spans.append([len(blob), len(data)])
+            blob.extend(data)
+        index[key] = spans
+    header = json.dumps({"meta": meta, "entries": index}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    # Çalışan worker'lar eski dosyayı okurken yarım dosya görmesin
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(_HEADER.pack(MAGIC, len(header)))
+        file.write(header)
+        file.write(blob)
+    os.replace(tmp_path, path)
+
+# ============================================================================
+# SÜREÇ BAŞINA YÜKLEME
+# ============================================================================
+
+_library: Optional[DescriptionLibrary] = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_description_library() -> Optional[DescriptionLibrary]:
+    # Etkin prompt sürümüne ait kütüphane yoksa None döner (canlı üretime düşülür)
+    global _library, _loaded
+    with _lock:
+        if not _loaded:
+            path = library_path(registry.get(LIBRARY_PROMPT).tag)
+            _library = DescriptionLibrary(path) if os.path.exists(path) else None
+            _loaded = True
+    return _library
+
+
+def get_description_library() -> Optional[DescriptionLibrary]:
+    if _loaded:
+        return _library
+    return load_description_library()
+
+# ============================================================================
+# ÇEVRİMDIŞI ÜRETİM (CLI)
+# ============================================================================
+
+def enumerate_option_space() -> Iterator[Tuple[str, str, str]]:
+    # Yalnızca raporda açıklaması istenen yanıtlar üretilir
+    from report_module import described_options, load_question_definitions
+
+    for category, subcats in load_question_definitions().items():
+        for subcategory, definition in subcats.items():
+            for option in described_options(definition.get("options", [])):
+                yield category, subcategory, option
+
+
+def partial_path(path: str) -> str:
+    return f"{path}.partial.jsonl"
+
+
+def load_partial(path: str, prompt_tag: str) -> Dict[Tuple[str, int], str]:
+    # Yarıda kalan üretimden kalan açıklamalar (yalnızca aynı prompt sürümü için)
+    done: Dict[Tuple[str, int], str] = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as file:
+        for raw in file:
+            try:
+                item = json.loads(raw)
+            except ValueError:
+                continue  # yazılırken kesilen son satır
+            if item.get("prompt_version") == prompt_tag:
+                done[(item["key"], item["variant"])] = item["text"]
+    return done
+
+
+def build_library(k: int, batch_size: int, max_concurrency: int, path: Optional[str] = None,
+                  retries: int = 2) -> str:
+    from ai_module import AI_MODEL, invoke_llm_batch
+
+    prompt = registry.get(LIBRARY_PROMPT)
+    path = path or library_path(prompt.tag)
+    progress_path = partial_path(path)
+    triples = list(enumerate_option_space())
+    prompts = {
+        (make_key(*triple), variant): prompt.render(category=triple[0], subcategory=triple[1],
+                                                    response=triple[2], variant=variant)
+        for triple in triples
+        for variant in range(1, k + 1)
+    }
+
+    # Her parti tamamlandıkça ilerleme dosyasına eklenir; yeniden çalıştırmada
+    # yalnızca eksik açıklamalar üretilir
+    done = load_partial(progress_path, prompt.tag)
+    if done:
+        print(f"  {len(done)} açıklama önceki çalıştırmadan devralındı")
+    directory = os.path.dirname(progress_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    with open(progress_path, "a", encoding="utf-8") as progress:
+        for attempt in range(retries + 1):
+            pending = [job for job in prompts if job not in done]
+            if not pending:
+                break
+            if attempt:
+                print(f"  {len(pending)} başarısız açıklama yeniden deneniyor ({attempt}/{retries})")
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                try:
+                    texts = invoke_llm_batch([prompts[job] for job in batch], max_concurrency,
+                                             return_exceptions=True)
+                except Exception as e:
+                    # Parti hiç gönderilemediyse (ör. kota) bir sonraki denemeye bırakılır
+                    print(f"  ⚠️ Parti gönderilemedi: {e}")
+                    continue
+                for (key, variant), text in zip(batch, texts):
+                    if isinstance(text, Exception):
+                        continue
+                    done[(key, variant)] = text
+                    progress.write(json.dumps({"prompt_version": prompt.tag, "key": key, "variant": variant,
+                                               "text": text}, ensure_ascii=False) + "\n")
+                progress.flush()
+                print(f"  {len(done)}/{len(prompts)} açıklama üretildi")
+
+    entries: Dict[str, List[str]] = {}
+    for (key, variant), text in sorted(done.items()):
+        if (key, variant) in prompts:
+            entries.setdefault(key, []).append(text)
+    missing = len(prompts) - sum(len(texts) for texts in entries.values())
+    if missing:
+        # Eksik varyantlar atlanır; hiç açıklaması olmayan yanıtlar canlı üretime düşer
+        print(f"  ⚠️ {missing} açıklama üretilemedi; kütüphane eksik varyantlarla yazılıyor")
+
+    write_library(path, entries, {
+        "prompt_version": prompt.tag,
+        "model": AI_MODEL,
+        "k": k,
+        "triples": len(triples),
+        "missing": missing,
+        "created_at": datetime.now().isoformat(timespec="seconds")
+    })
+    if not missing:
+        os.remove(progress_path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soru seçenekleri için açıklama kütüphanesini üret")
+    parser.add_argument("--k", type=int, default=3, help="Her yanıt için üretilecek açıklama sayısı")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=2, help="Başarısız açıklamalar için yeniden deneme turu")
+    parser.add_argument("--out", default=None, help="Varsayılan: etkin prompt sürümüne göre dosya adı")
+    args = parser.parse_args()
+
+    triples = sum(1 for _ in enumerate_option_space())
+    print(f"📚 {triples} yanıt × {args.k} varyant = {triples * args.k} açıklama üretilecek")
+    path = build_library(args.k, args.batch_size, args.max_concurrency, args.out, args.retries)
+    print(f"✅ Kütüphane kaydedildi: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import json
+import os
+from typing import AsyncIterator, Dict, List, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect, Request
+from pydantic import Field, StringConstraints
+from typing_extensions import Annotated
+
+load_dotenv()
+
+# Ortam değişkenleri (bayt / adet / karakter)
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", 256 * 1024))
+MAX_BULK_BODY_BYTES = int(os.getenv("MAX_BULK_BODY_BYTES", 64 * 1024 * 1024))
+MAX_BULK_LINE_BYTES = int(os.getenv("MAX_BULK_LINE_BYTES", MAX_BODY_BYTES))
+MAX_CATEGORIES = int(os.getenv("MAX_CATEGORIES", 16))
+MAX_SUBCATEGORIES = int(os.getenv("MAX_SUBCATEGORIES", 64))
+MAX_LIST_ITEMS = int(os.getenv("MAX_LIST_ITEMS", 32))
+MAX_FIELD_LENGTH = int(os.getenv("MAX_FIELD_LENGTH", 200))
+MAX_ANSWER_LENGTH = int(os.getenv("MAX_ANSWER_LENGTH", 1000))
+MAX_TEXT_LENGTH = int(os.getenv("MAX_TEXT_LENGTH", 4000))
+
+# ============================================================================
+# SINIRLI ALAN TİPLERİ (pydantic şemalarında kullanılır)
+# ============================================================================
+
+ShortStr = Annotated[str, StringConstraints(max_length=MAX_FIELD_LENGTH)]
+AnswerStr = Annotated[str, StringConstraints(max_length=MAX_ANSWER_LENGTH)]
+TextStr = Annotated[str, StringConstraints(max_length=MAX_TEXT_LENGTH)]
+ShortStrList = Annotated[List[ShortStr], Field(max_length=MAX_LIST_ITEMS)]
+ResponseMap = Annotated[
+    Dict[ShortStr, Annotated[Dict[ShortStr, AnswerStr], Field(max_length=MAX_SUBCATEGORIES)]],
+    Field(max_length=MAX_CATEGORIES)
+]
+
+# ============================================================================
+# İSTEK GÖVDESİ BOYUT SINIRI
+# ============================================================================
+
+class BodySizeLimitMiddleware:
+    # Gövde belleğe alınmadan önce Content-Length, akış sırasında da okunan
+    # bayt sayısı kontrol edilir; sınır aşılırsa 413 döner.
+    def __init__(self, app, max_body_bytes: int = MAX_BODY_BYTES, path_limits: Dict[str, int] = None):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.path_limits.get(scope["path"], self.max_body_bytes)
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                await self._reject(send, limit)
+                return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=f"İstek gövdesi {limit} baytı aşamaz.")
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as e:
+            if e.status_code != 413 or response_started:
+                raise
+            await self._reject(send, limit)
+
+    @staticmethod
+    async def _reject(send, limit: int) -> None:
+        body = json.dumps({"detail": f"İstek gövdesi {limit} baytı aşamaz."}, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+# ============================================================================
+# ARTIMLI NDJSON AYRIŞTIRICI (toplu yüklemeler için)
+# ============================================================================
+
+class LineTooLongError(ValueError):
+    pass
+
+
+class RequestBodyStream:
+    # request.stream() gövdenin bittiğini bildirmez; bitince bağlantı kopması
+    # receive kanalından güvenle kontrol edilebilir (öncesinde gövde parçası tüketilirdi)
+    def __init__(self, request: Request):
+        self.request = request
+        self.complete = False
+
+    async def __aiter__(self):
+        while not self.complete:
+            message = await self.request.receive()
+            if message["type"] == "http.disconnect":
+                raise ClientDisconnect()
+            self.complete = not message.get("more_body", False)
+            body = message.get("body", b"")
+            if body:
+                yield body
+
+    async def is_disconnected(self) -> bool:
+        return self.complete and await self.request.is_disconnected()
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes],
+    max_line_bytes: int = MAX_BULK_LINE_BYTES
+) -> AsyncIterator[Tuple[int, bytes]]:
+    # Gövde parça parça okunur; bellekte en fazla bir satır (+ bir parça) tutulur
+    buffer = bytearray()
+    line_no = 0
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end == -1:
+                break
+            line_no += 1
+            line = bytes(buffer[start:end]).strip()
+            if len(line) > max_line_bytes:
+                raise LineTooLongError(f"{line_no}. satır {max_line_bytes} baytı aşıyor.")
+            if line:
+                yield line_no, line
+            start = end + 1
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            raise LineTooLongError(f"{line_no + 1}. satır {max_line_bytes} baytı aşıyor.")
+
+    line = bytes(buffer).strip()
+    if line:
+        yield line_no + 1, line
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    # StreamingResponse, ASGI 2.4 öncesi sunucularda (uvicorn) bağlantı kopmasını
+    # dinlemek için receive kanalını okur; bu da akış halindeki istek gövdesini
+    # tüketir. Gövde yanıtla eşzamanlı okunduğu için burada dinleyici kullanılmaz.
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        async for chunk in self.body_iterator:
+            if not isinstance(chunk, (bytes, memoryview)):
+                chunk = chunk.encode(self.charset)
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
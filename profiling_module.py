@@ -0,0 +1,251 @@
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+from cache_module import get_cache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Ortam değişkenleri
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", 5))
+# Yapılandırmanın paylaşılan önbellekten yeniden okunma aralığı (sn)
+PROFILING_CONFIG_REFRESH_SECONDS = float(os.getenv("PROFILING_CONFIG_REFRESH_SECONDS", 2))
+PROFILING_MAX_DEPTH = int(os.getenv("PROFILING_MAX_DEPTH", 64))
+
+PROFILING_CONFIG_KEY = "profiling:config"
+
+# Boşta bekleyen thread'ler (ör. thread havuzu, olay döngüsü select'i) örneklenmez
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("periodic_executor.py", "_run"),
+    ("thread.py", "_worker"),
+}
+
+# ============================================================================
+# İSTATİSTİKSEL ÖRNEKLEYİCİ
+# ============================================================================
+
+class SamplingProfiler:
+    # Profil alınan bir istek sürerken arka plandaki thread belirli aralıklarla
+    # tüm thread'lerin yığınlarını okur ve "folded stack" biçiminde sayar
+    # (flamegraph.pl, speedscope ve benzeri araçlarla doğrudan açılabilir).
+    # Örnek yalnızca süreçte tek bir istek işlenirken o istek ucuna yazılır;
+    # eşzamanlı istekler varken alınan örnekler süreç geneli "*" altında toplanır.
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 1.0
+        self.route: Optional[str] = None
+        self.interval = PROFILING_INTERVAL_MS / 1000
+        self._lock = threading.Lock()
+        self._active: Dict[int, str] = {}
+        self._next_id = 0
+        self._samples: Dict[str, Counter] = {}
+        self._sample_count = 0
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        # Middleware'den geçen tüm HTTP istekleri (yalnızca olay döngüsünde güncellenir)
+        self.in_flight = 0
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watcher = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Yapılandırma (tüm worker'lar paylaşılan önbellek üzerinden aynı ayarı görür)
+    # ------------------------------------------------------------------
+
+    def configure(self, enabled: bool, sample_rate: float = 1.0, route: Optional[str] = None,
+                  interval_ms: Optional[float] = None) -> Dict[str, Any]:
+        config = {
+            "enabled": enabled,
+            "sample_rate": sample_rate,
+            "route": route,
+            "interval_ms": interval_ms or PROFILING_INTERVAL_MS
+        }
+        get_cache().set(PROFILING_CONFIG_KEY, config, ttl=0)
+        self._apply(config)
+        return config
+
+    def refresh(self) -> None:
+        config = get_cache().get(PROFILING_CONFIG_KEY)
+        if config is not None:
+            self._apply(config)
+
+    def start_config_watcher(self) -> None:
+        # Önbellek okuması olay döngüsünü bekletmesin diye ayarlar arka planda yenilenir
+        if self._watcher is not None:
+            return
+        self._stop_watcher.clear()
+        self._watcher = threading.Thread(target=self._watch_config, name="profiling-config", daemon=True)
+        self._watcher.start()
+
+    def stop_config_watcher(self) -> None:
+        self._stop_watcher.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=PROFILING_CONFIG_REFRESH_SECONDS + 1)
+            self._watcher = None
+
+    def _watch_config(self) -> None:
+        while not self._stop_watcher.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                # Önbellek erişilemezse son bilinen ayarla devam edilir
+                logger.warning(f"Profil ayarları okunamadı: {e}")
+            self._stop_watcher.wait(PROFILING_CONFIG_REFRESH_SECONDS)
+
+    def _apply(self, config: Dict[str, Any]) -> None:
+        self.sample_rate = config["sample_rate"]
+        self.route = config["route"]
+        self.interval = config["interval_ms"] / 1000
+        with self._lock:
+            self.enabled = config["enabled"]
+        if self.enabled:
+            self._ensure_thread()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sample_rate": self.sample_rate,
+                "route": self.route,
+                "interval_ms": self.interval * 1000,
+                "worker_pid": os.getpid(),
+                "samples": self._sample_count,
+                "routes": {route: sum(stacks.values()) for route, stacks in self._samples.items()}
+            }
+
+    # ------------------------------------------------------------------
+    # İstek takibi
+    # ------------------------------------------------------------------
+
+    def should_profile(self, path: str) -> bool:
+        if self.route is not None and path != self.route:
+            return False
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def begin(self, route: str) -> int:
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            self._active[request_id] = route
+        self._wakeup.set()
+        return request_id
+
+    def end(self, request_id: int) -> None:
+        with self._lock:
+            self._active.pop(request_id, None)
+
+    # ------------------------------------------------------------------
+    # Örnekleme
+    # ------------------------------------------------------------------
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self.enabled:
+                    self._thread = None
+                    return
+                routes = set(self._active.values())
+            if not routes:
+                # Profil alınan istek yokken uyur; yeni istek gelince uyanır
+                self._wakeup.wait(timeout=1.0)
+                self._wakeup.clear()
+                continue
+            # Diğer isteklerin thread'leri de örneğe girer; süreçte başka istek
+            # varken örnek tek bir uca atfedilemez
+            route = routes.pop() if len(routes) == 1 and self.in_flight <= 1 else "*"
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = self._fold(frame)
+                if stack:
+                    stacks.append(stack)
+            with self._lock:
+                counter = self._samples.setdefault(route, Counter())
+                counter.update(stacks)
+                self._sample_count += 1
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _fold(frame) -> Optional[str]:
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+            return None
+        names = []
+        depth = 0
+        while frame is not None and depth < PROFILING_MAX_DEPTH:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+            depth += 1
+        return ";".join(reversed(names))
+
+    # ------------------------------------------------------------------
+    # Çıktı
+    # ------------------------------------------------------------------
+
+    def folded(self, route: Optional[str] = None) -> str:
+        with self._lock:
+            counter = Counter()
+            for name, stacks in self._samples.items():
+                if route is None or name == route:
+                    counter.update(stacks)
+        return "\n".join(f"{stack} {count}" for stack, count in counter.most_common())
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._sample_count = 0
+
+
+profiler = SamplingProfiler()
+
+# ============================================================================
+# MIDDLEWARE
+# ============================================================================
+
+class ProfilingMiddleware:
+    # Kapalıyken istek başına yalnızca bellekteki bayrak okunur ve sayaç güncellenir;
+    # ayarlar start_config_watcher ile arka planda yenilenir
+    def __init__(self, app, profiler: SamplingProfiler = profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profiler = self.profiler
+        profiler.in_flight += 1
+        try:
+            if not profiler.enabled or not profiler.should_profile(scope["path"]):
+                await self.app(scope, receive, send)
+                return
+
+            request_id = profiler.begin(scope["path"])
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                profiler.end(request_id)
+        finally:
+            profiler.in_flight -= 1
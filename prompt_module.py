@@ -0,0 +1,176 @@
+import hashlib
+import os
+import re
+from string import Formatter
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# A/B denemeleri için etkin sürüm seçimi, ör. "description=2,enriched_report=1"
+PROMPT_VERSIONS = os.getenv("PROMPT_VERSIONS", "")
+
+# ============================================================================
+# DERLENMİŞ PROMPT
+# ============================================================================
+
+def normalize_whitespace(template: str) -> str:
+    # Satır başı/sonu boşlukları ve ardışık boş satırlar token israfıdır
+    lines = [line.strip() for line in template.strip().splitlines()]
+    text = "\n".join(lines)
+    return re.sub(r"\n{3,}", "\n\n", text)
+
+
+class CompiledPrompt:
+    def __init__(self, name: str, version: str, template: str):
+        self.name = name
+        self.version = version
+        self.template = normalize_whitespace(template)
+        self.content_hash = hashlib.sha256(self.template.encode("utf-8")).hexdigest()
+        # Şablon bir kez ayrıştırılır; render sırasında yalnızca birleştirme yapılır
+        self._pieces: List[Tuple[str, Optional[str]]] = [
+            (literal, field) for literal, field, _, _ in Formatter().parse(self.template)
+        ]
+        self.variables = [field for _, field in self._pieces if field is not None]
+
+    @property
+    def tag(self) -> str:
+        return f"{self.name}@{self.version}+{self.content_hash[:12]}"
+
+    def render(self, **values: str) -> str:
+        parts = []
+        for literal, field in self._pieces:
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(values[field]))
+        return "".join(parts)
+
+# ============================================================================
+# PROMPT KAYIT DEFTERİ
+# ============================================================================
+
+class PromptRegistry:
+    def __init__(self, active_versions: str = ""):
+        self._prompts: Dict[str, Dict[str, CompiledPrompt]] = {}
+        self._active: Dict[str, str] = {}
+        for item in filter(None, (part.strip() for part in active_versions.split(","))):
+            name, _, version = item.partition("=")
+            self._active[name.strip()] = version.strip()
+
+    def register(self, name: str, version: str, template: str) -> CompiledPrompt:
+        prompt = CompiledPrompt(name, version, template)
+        self._prompts.setdefault(name, {})[version] = prompt
+        return prompt
+
+    def get(self, name: str, version: Optional[str] = None) -> CompiledPrompt:
+        versions = self._prompts.get(name)
+        if not versions:
+            raise KeyError(f"Tanımsız prompt: {name}")
+        version = version or self._active.get(name) or list(versions)[-1]
+        if version not in versions:
+            raise KeyError(f"Tanımsız prompt sürümü: {name}@{version}")
+        return versions[version]
+
+    def versions(self, name: str) -> List[str]:
+        return list(self._prompts.get(name, {}))
+
+    def manifest(self) -> Dict[str, str]:
+        # Etkin sürümlerin etiketleri (rapor ve önbellek anahtarları için)
+        return {name: self.get(name).tag for name in self._prompts}
+
+# ============================================================================
+# ŞABLONLAR
+# ============================================================================
+
+registry = PromptRegistry(PROMPT_VERSIONS)
+
+# 1. Basit rapor
+registry.register("student_report", "1", """
+Öğrencinin {ders_adı} dersi için gelişim raporunu hazırlayın.
+Öğrencinin güçlü yönleri: {guclu_yonler}.
+Geliştirilmesi gereken alanlar: {gelisim_alanlari}.
+Öneriler: {oneriler}.
+Ayrıntılı, kapsamlı ve yapılandırılmış bir rapor oluşturun.
+""")
+
+# 2. Zenginleştirilmiş rapor
+registry.register("enriched_report", "1", """
+Sen bir eğitim uzmanısın. Elinde bir öğrencinin farklı alanlarda değerlendirme verileri bulunuyor.
+Bu verileri kullanarak, öğrenciye dair kapsamlı, pedagojik ve yapıcı bir rapor hazırlayacaksın.
+
+Değerlendirme, öğrencinin akademik, sosyal, duygusal ve kişisel gelişimiyle ilgili verileri içeriyor.
+Bu verileri kullanarak öğrencinin güçlü yanlarını, gelişim fırsatlarını ve geleceğe dönük önerileri belirt.
+
+Öncelikli Pedagojik İlkeler:
+- Öğrencinin adı geçmeyecek.
+- Negatif alanları ‘gelişime açık yönler’ olarak ifade et; aşırı övgü veya kesin yargılardan kaçın.
+- Vereceğin öneriler somut, gerçekçi ve eğitim bilimine uygun olsun.
+
+Rapor Formatı:
+1) Genel Durum Özeti (kısa bir giriş)
+2) Akademik Değerlendirme
+3) Sosyal ve Duygusal Gelişim
+4) Beceri Değerlendirmesi
+5) Kişisel Gelişim ve Motivasyon
+6) Öğrencinin İlgi Alanları
+7) Öneriler ve Sonuç (hem öğrenci hem de gerektiğinde öğretmen/veli için)
+
+Her önerinin neden faydalı olduğunu, mümkün olduğunca kısa bir açıklamayla belirt.
+Akademik fakat anlaşılır bir dil kullan; terminoloji gerekiyorsa tanımlayarak açıkla.
+
+---
+Elimizdeki veriler:
+- Akademik Performans: {akademik_veri}
+- Sosyal ve Duygusal Gelişim: {sosyal_veri}
+- Beceri Değerlendirmesi: {beceri_veri}
+- Kişisel Gelişim/Motivasyon: {kisisel_veri}
+- İlgi Alanları: {ilgi_veri}
+
+Lütfen yukarıdaki maddeleri dikkate alarak kapsamlı bir rapor hazırla.
+""")
+
+# 3. Madde bazlı açıklama (rapordaki her güçlü yön / gelişim alanı için)
+registry.register("description", "1", """
+Öğrenci: Anonim
+Değerlendirme Tarihi: {date}
+Kategori: {category}
+Alt Kategori: {subcategory}
+Yanıt: {response}
+
+Bu bilgilere göre öğrenciyi tanımlayan kısa, pozitif ve eğitici bir açıklama yaz.
+Aynı ifadeyle başlama (örneğin: 'Bu öğrenci...' ile).
+Özgün cümle yapıları kullanmaya dikkat et.
+(Öğrencinin adı geçmesin, gelişime açık yönleri incelikle vurgula.)
+""")
+
+# 4. Zenginleştirilmiş raporun tek bir bölümü (paralel üretim için)
+registry.register("enriched_section", "1", """
+Sen bir eğitim uzmanısın. Bir öğrencinin değerlendirme verilerinden hazırlanan pedagojik raporun
+yalnızca "{section}" bölümünü yazacaksın; başlık ekleme, diğer bölümlere geçme.
+
+Öncelikli Pedagojik İlkeler:
+- Öğrencinin adı geçmeyecek.
+- Negatif alanları ‘gelişime açık yönler’ olarak ifade et; aşırı övgü veya kesin yargılardan kaçın.
+- Vereceğin öneriler somut, gerçekçi ve eğitim bilimine uygun olsun.
+Akademik fakat anlaşılır bir dil kullan; terminoloji gerekiyorsa tanımlayarak açıkla.
+
+Bölüm odağı: {focus}
+
+---
+Elimizdeki veriler:
+{veriler}
+""")
+
+# 5. Çevrimdışı açıklama kütüphanesi için madde bazlı açıklama (tarih içermez)
+registry.register("description_offline", "1", """
+Öğrenci: Anonim
+Kategori: {category}
+Alt Kategori: {subcategory}
+Yanıt: {response}
+
+Bu bilgilere göre öğrenciyi tanımlayan kısa, pozitif ve eğitici bir açıklama yaz.
+Aynı ifadeyle başlama (örneğin: 'Bu öğrenci...' ile).
+Özgün cümle yapıları kullanmaya dikkat et; bu, aynı yanıt için yazılan {variant}. farklı açıklamadır.
+(Öğrencinin adı geçmesin, gelişime açık yönleri incelikle vurgula.)
+""")
@@ -1,9 +1,16 @@
 import json
 import os
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, List, Any
 
-from ai_module import get_ai_response
+from ai_module import (
+    get_ai_response,
+    generate_enriched_student_report,
+    generate_enriched_student_report_parallel
+)
+from prompt_module import registry
+from description_library import get_description_library
 
 # ============================================================================
 # VERİ MODELLERİ
@@ -85,6 +92,7 @@ class Report:
         self.date = date
         self.content: Dict[str, Any] = {}
         self.recommendations: Dict[str, List[str]] = {}
+        self.prompt_version = ""
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -93,13 +101,16 @@ class Report:
             "assessment_id": self.assessment_id,
             "date": self.date,
             "content": self.content,
-            "recommendations": self.recommendations
+            "recommendations": self.recommendations,
+            "prompt_version": self.prompt_version
         }
 
 # ============================================================================
 # SORU TANIMLARI
 # ============================================================================
 
+# Tanımlar değişmediği için süreç başına bir kez okunur (başlangıçta ısıtılır)
+@lru_cache(maxsize=1)
 def load_question_definitions() -> Dict[str, Any]:
     json_path = os.path.join(os.path.dirname(__file__), "question_definitions.json")
     with open(json_path, "r", encoding="utf-8") as file:
@@ -118,6 +129,11 @@ def process_assessment(assessment: Assessment, student: Student) -> Dict[str, An
     return results
 
 
+def described_options(options: List[str]) -> List[str]:
+    # Rapora açıklamayla giren yanıtlar: güçlü yönler (ilk iki) ve gelişim alanları (son iki)
+    return list(dict.fromkeys(options[:2] + options[-2:]))
+
+
 def identify_strengths(assessment: Assessment) -> List[Dict[str, Any]]:
     strengths = []
     definitions = load_question_definitions()
@@ -141,19 +157,21 @@ def identify_growth_areas(assessment: Assessment) -> List[Dict[str, Any]]:
 
 
 def generate_description_ai(assessment: Assessment, category: str, subcategory: str, response: str) -> str:
-    prompt = f"""
-    Öğrenci: Anonim
-    Değerlendirme Tarihi: {assessment.date}
-    Kategori: {category}
-    Alt Kategori: {subcategory}
-    Yanıt: {response}
-
-    Bu bilgilere göre öğrenciyi tanımlayan kısa, pozitif ve eğitici bir açıklama yaz.
-    Aynı ifadeyle başlama (örneğin: 'Bu öğrenci...' ile).
-    Özgün cümle yapıları kullanmaya dikkat et.
-    (Öğrencinin adı geçmesin, gelişime açık yönleri incelikle vurgula.)
-    """
-    return get_ai_response(prompt)
+    # Önce çevrimdışı üretilmiş kütüphaneye bakılır; bilinmeyen yanıtlar canlı üretilir
+    library = get_description_library()
+    if library is not None:
+        description = library.lookup(category, subcategory, response, seed=assessment.assessment_id)
+        if description is not None:
+            return description
+
+    prompt = registry.get("description")
+    formatted_prompt = prompt.render(
+        date=assessment.date,
+        category=category,
+        subcategory=subcategory,
+        response=response
+    )
+    return get_ai_response(formatted_prompt, prompt.tag)
 
 # ============================================================================
 # RAPOR OLUŞTURMA
@@ -167,6 +185,8 @@ def generate_report(student: Student, assessment: Assessment, results: Dict[str,
         assessment_id=assessment.assessment_id,
         date=datetime.now().strftime("%Y-%m-%d")
     )
+    # Rapor, üretiminde kullanılan prompt sürümüyle etiketlenir
+    report.prompt_version = registry.get("description").tag
 
     strengths = results["strengths"]
     growth_areas = results["growth_areas"]
@@ -186,7 +206,66 @@ def generate_report(student: Student, assessment: Assessment, results: Dict[str,
         ],
         "summary": results["summary"]
     }
+    library = get_description_library()
+    if library is not None:
+        report.content["description_library"] = library.prompt_version
+
+    return report
+
+# ============================================================================
+# ZENGİNLEŞTİRİLMİŞ RAPOR
+# ============================================================================
+
+# Değerlendirme kategorilerinin zenginleştirilmiş rapor alanlarına karşılığı
+ENRICHED_CATEGORY_FIELDS = {
+    "academic": "akademik_veri",
+    "social_emotional": "sosyal_veri",
+    "skills": "beceri_veri",
+    "personal_development": "kisisel_veri",
+    "interests": "ilgi_veri",
+}
+
+
+def build_enriched_inputs(assessment: Assessment, student: Student) -> Dict[str, str]:
+    parts: Dict[str, List[str]] = {field: [] for field in ENRICHED_CATEGORY_FIELDS.values()}
+    for category, subcats in assessment.responses.items():
+        field = ENRICHED_CATEGORY_FIELDS.get(category)
+        if field is None:
+            continue
+        for subcat, response in subcats.items():
+            parts[field].append(f"{subcat}: {response}")
+
+    if student.interests:
+        parts["ilgi_veri"].append("öğrenci ilgi alanları: " + ", ".join(student.interests))
+    if student.learning_style:
+        parts["akademik_veri"].append("öğrenme stili: " + ", ".join(student.learning_style))
+
+    return {field: "; ".join(items) or "Veri yok" for field, items in parts.items()}
 
+
+def generate_enriched_report(student: Student, assessment: Assessment, parallel: bool = False) -> Report:
+    report = Report(
+        report_id=f"RPT-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+        student_id=student.student_id,
+        assessment_id=assessment.assessment_id,
+        date=datetime.now().strftime("%Y-%m-%d")
+    )
+    inputs = build_enriched_inputs(assessment, student)
+    if parallel:
+        report.prompt_version = registry.get("enriched_section").tag
+        text = generate_enriched_student_report_parallel(**inputs)
+    else:
+        report.prompt_version = registry.get("enriched_report").tag
+        text = generate_enriched_student_report(**inputs)
+
+    report.content = {
+        "student_reference": "Öğrenci (Anonim)",
+        "grade": student.grade,
+        "assessment_date": assessment.date,
+        "assessor": assessment.assessor_name,
+        "mode": "parallel" if parallel else "single",
+        "enriched_report": text
+    }
     return report
 
 # ============================================================================
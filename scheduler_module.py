@@ -0,0 +1,434 @@
+import asyncio
+import heapq
+import itertools
+import os
+import socket
+import threading
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Ortam değişkenleri
+# Worker başına eşzamanlı LLM işi sayısı; Starlette thread havuzundan (40) küçük tutulmalı
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+# Kuyrukta en fazla bekleme süresi (sn); aşılırsa 503 döner
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 30))
+# İş başına tahmini token (adil sıralama ve kota rezervasyonu için; iş bitince düzeltilir)
+LLM_JOB_TOKEN_ESTIMATE = int(os.getenv("LLM_JOB_TOKEN_ESTIMATE", 2000))
+# Kiracı başına günlük token kotası (0 = sınırsız)
+TENANT_DAILY_TOKEN_QUOTA = int(os.getenv("TENANT_DAILY_TOKEN_QUOTA", 0))
+# Kiracıya özel kota ve ağırlıklar, ör. "okul-a.k12.tr=500000,okul-b.k12.tr=200000"
+TENANT_QUOTAS = os.getenv("TENANT_QUOTAS", "")
+TENANT_WEIGHTS = os.getenv("TENANT_WEIGHTS", "")
+
+# Öncelik sınıfları (küçük değer önce çalışır)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_CLASSES = {"interactive": PRIORITY_INTERACTIVE, "batch": PRIORITY_BATCH}
+
+# İstek bağlamı: endpoint'te JWT'den belirlenir, thread havuzuna kopyalanarak taşınır.
+# Varsayılan değer yalnızca HTTP dışı çalıştırmalar (CLI, betikler) içindir.
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default="local")
+current_priority: ContextVar[int] = ContextVar("current_priority", default=PRIORITY_INTERACTIVE)
+
+
+class _JobUsage:
+    # Kabul edilen tek bir işin rezervasyonu ve gerçek kullanımı; bağlam kopyalanarak
+    # thread'lere taşındığında aynı nesne paylaşılır (güncellemeler kilit altında)
+    def __init__(self, tenant: str, reserved: int):
+        self.tenant = tenant
+        self.reserved = reserved
+        self.tokens = 0
+
+
+current_job: ContextVar[Optional[_JobUsage]] = ContextVar("current_job", default=None)
+
+
+class QuotaExceededError(Exception):
+    def __init__(self, tenant: str, used: int, quota: int):
+        super().__init__(f"{tenant} için günlük token kotası aşıldı ({used}/{quota}).")
+        self.tenant = tenant
+        self.used = used
+        self.quota = quota
+
+
+class QueueTimeoutError(Exception):
+    def __init__(self, tenant: str, timeout: float):
+        super().__init__(f"{tenant} için LLM kuyruğunda bekleme süresi ({timeout:.0f} sn) aşıldı.")
+        self.tenant = tenant
+        self.timeout = timeout
+
+
+def _parse_mapping(raw: str) -> Dict[str, float]:
+    mapping = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        name, _, value = item.partition("=")
+        mapping[name.strip()] = float(value)
+    return mapping
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+# ============================================================================
+# KİRACI DURUMU
+# ============================================================================
+
+class _TenantState:
+    def __init__(self, weight: float, quota: int):
+        self.weight = weight
+        self.quota = quota
+        self.day = _today()
+        self.synced_tokens = 0      # Mongo'daki son bilinen toplam
+        self.pending_tokens = 0     # Henüz Mongo'ya yazılmamış kullanım
+        self.pending_requests = 0
+        self.reserved_tokens = 0    # Çalışmakta olan çağrılar için ayrılan tahmin
+        self.last_finish = 0.0      # Adil sıralama için sanal bitiş zamanı
+        self.in_flight = 0
+        self.completed = 0
+
+    @property
+    def used_tokens(self) -> int:
+        return self.synced_tokens + self.pending_tokens
+
+    def roll_day(self) -> None:
+        today = _today()
+        if today != self.day:
+            self.day = today
+            self.synced_tokens = 0
+            self.pending_tokens = 0
+            self.pending_requests = 0
+
+
+class _Waiter:
+    def __init__(self, tenant: str, priority: int, tokens: int, slots: int, future: "asyncio.Future"):
+        self.tenant = tenant
+        self.priority = priority
+        self.tokens = tokens
+        self.slots = slots
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+# ============================================================================
+# ZAMANLAYICI
+# ============================================================================
+
+class LLMScheduler:
+    # Kabul, iş thread havuzuna gönderilmeden önce olay döngüsünde yapılır; böylece
+    # kuyrukta bekleyen işler Starlette'in thread havuzunu işgal etmez ve öncelik
+    # sırası havuzun ilk gelen ilk çıkar sırasının arkasında kalmaz.
+    #
+    # Ağırlıklı adil kuyruk: her işin sanal bitiş zamanı
+    # max(sanal_saat, kiracının son bitişi) + tahmini maliyet / ağırlık olarak hesaplanır;
+    # iş bitince tahmin ile gerçek kullanım arasındaki fark kiracının son bitişine yansıtılır.
+    # Kuyruk önce öncelik sınıfına, sonra sanal bitiş zamanına göre sıralanır.
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        default_quota: int = TENANT_DAILY_TOKEN_QUOTA,
+        quotas: Optional[Dict[str, float]] = None,
+        weights: Optional[Dict[str, float]] = None,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT
+    ):
+        self.max_concurrency = max_concurrency
+        self.default_quota = default_quota
+        self.queue_timeout = queue_timeout
+        self._quotas = quotas if quotas is not None else _parse_mapping(TENANT_QUOTAS)
+        self._weights = weights if weights is not None else _parse_mapping(TENANT_WEIGHTS)
+        # Kullanım sayaçları model çağrısı yapan thread'lerden de güncellenir
+        self._lock = threading.Lock()
+        self._queue: List[Tuple[int, float, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._running = 0
+        self._tenants: Dict[str, _TenantState] = {}
+
+    def _state(self, tenant: str) -> _TenantState:
+        state = self._tenants.get(tenant)
+        if state is None:
+            state = _TenantState(
+                weight=self._weights.get(tenant, 1.0),
+                quota=int(self._quotas.get(tenant, self.default_quota))
+            )
+            self._tenants[tenant] = state
+        state.roll_day()
+        return state
+
+    def _dispatch(self) -> None:
+        # Kilit tutulurken çağrılır
+        while self._queue:
+            _, finish, _, waiter = self._queue[0]
+            if waiter.future.done():
+                # Zaman aşımına uğramış ya da iptal edilmiş bekleyen
+                heapq.heappop(self._queue)
+                continue
+            # Sıradaki iş sığmıyorsa arkadakiler öne geçmez (çok yuvalı işler aç kalmasın)
+            if self._running + waiter.slots > self.max_concurrency:
+                break
+            heapq.heappop(self._queue)
+            state = self._state(waiter.tenant)
+            self._virtual_time = max(self._virtual_time, finish - waiter.tokens / state.weight)
+            self._running += waiter.slots
+            state.in_flight += 1
+            waiter.future.set_result(None)
+
+    def _check_quota(self, tenant: str, own_reserved: int = 0) -> None:
+        # Kilit tutulurken çağrılır; çağıran işin kendi rezervasyonu diğerlerinden ayrılır
+        state = self._state(tenant)
+        if state.quota and state.used_tokens + state.reserved_tokens - own_reserved >= state.quota:
+            raise QuotaExceededError(tenant, state.used_tokens, state.quota)
+
+    async def acquire(self, tenant: str, priority: int, tokens: int, slots: int = 1) -> None:
+        # slots: işin aynı anda yapacağı model çağrısı sayısı (eşzamanlılık sınırından pay)
+        slots = max(1, min(slots, self.max_concurrency))
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._check_quota(tenant)
+            state = self._state(tenant)
+            state.reserved_tokens += tokens
+            finish = max(self._virtual_time, state.last_finish) + tokens / state.weight
+            state.last_finish = finish
+            waiter = _Waiter(tenant, priority, tokens, slots, loop.create_future())
+            heapq.heappush(self._queue, (priority, finish, next(self._seq), waiter))
+            self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.queue_timeout)
+        except BaseException as e:
+            with self._lock:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    # Tam zaman aşımı anında kabul edildiyse yeri geri bırakılır
+                    self._running -= slots
+                    state.in_flight -= 1
+                    self._dispatch()
+                else:
+                    waiter.future.cancel()
+                state.reserved_tokens -= tokens
+            if isinstance(e, asyncio.TimeoutError):
+                raise QueueTimeoutError(tenant, self.queue_timeout)
+            raise
+
+    def release(self, tenant: str, reserved: int, slots: int = 1) -> None:
+        slots = max(1, min(slots, self.max_concurrency))
+        with self._lock:
+            state = self._state(tenant)
+            state.reserved_tokens -= reserved
+            state.in_flight -= 1
+            state.completed += 1
+            self._running -= slots
+            self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, tokens: int = LLM_JOB_TOKEN_ESTIMATE, tenant: Optional[str] = None,
+                    priority: Optional[int] = None, slots: int = 1):
+        # Bir isteğin tüm model çağrıları tek bir kabul ile çalışır; çağrıları
+        # eşzamanlı yapan işler bu sayıda yuva ister
+        tenant = tenant or current_tenant.get()
+        priority = current_priority.get() if priority is None else priority
+        await self.acquire(tenant, priority, tokens, slots)
+        # Kiracı toplamı eşzamanlı işler ve eşitleme ile de değiştiğinden gerçek
+        # kullanım işin kendi sayacından okunur
+        job = _JobUsage(tenant, tokens)
+        token = current_job.set(job)
+        try:
+            yield
+        finally:
+            current_job.reset(token)
+            with self._lock:
+                state = self._state(tenant)
+                # Tahmin ile gerçek kullanım arasındaki fark adil sıralamaya yansıtılır
+                state.last_finish += (job.tokens - tokens) / state.weight
+            self.release(tenant, tokens, slots)
+
+    def record_usage(self, tokens: int, tenant: Optional[str] = None) -> None:
+        # Model çağrısını yapan thread'den gerçek token kullanımı işlenir
+        job = current_job.get()
+        tenant = tenant or (job.tenant if job is not None else current_tenant.get())
+        with self._lock:
+            state = self._state(tenant)
+            state.pending_tokens += tokens
+            state.pending_requests += 1
+            if job is not None and job.tenant == tenant:
+                job.tokens += tokens
+
+    def check_quota(self, tenant: Optional[str] = None) -> None:
+        # Çok çağrılı işlerde kota her çağrıdan önce yeniden kontrol edilir; işin
+        # kabulde ayrılan kendi rezervasyonu bu kontrolde sayılmaz
+        job = current_job.get()
+        tenant = tenant or (job.tenant if job is not None else current_tenant.get())
+        own_reserved = job.reserved if job is not None and job.tenant == tenant else 0
+        with self._lock:
+            self._check_quota(tenant, own_reserved)
+
+    # ------------------------------------------------------------------
+    # Kalıcılık (Mongo ile eşitleme)
+    # ------------------------------------------------------------------
+
+    def drain_usage(self) -> List[Dict[str, Any]]:
+        # Yazılmamış kullanımı al; yazılamazsa restore_usage ile geri konur
+        deltas = []
+        with self._lock:
+            for tenant, state in self._tenants.items():
+                state.roll_day()
+                if state.pending_tokens or state.pending_requests:
+                    deltas.append({
+                        "tenant": tenant,
+                        "day": state.day,
+                        "tokens": state.pending_tokens,
+                        "requests": state.pending_requests
+                    })
+                    state.synced_tokens += state.pending_tokens
+                    state.pending_tokens = 0
+                    state.pending_requests = 0
+        return deltas
+
+    def restore_usage(self, delta: Dict[str, Any]) -> None:
+        with self._lock:
+            state = self._state(delta["tenant"])
+            if state.day == delta["day"]:
+                state.synced_tokens -= delta["tokens"]
+                state.pending_tokens += delta["tokens"]
+                state.pending_requests += delta["requests"]
+
+    def sync_usage(self, tenant: str, day: str, total_tokens: int) -> None:
+        # Tüm worker'ların toplam kullanımı (Mongo'dan) yerel sayaca işlenir
+        with self._lock:
+            state = self._state(tenant)
+            if state.day == day:
+                state.synced_tokens = total_tokens
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.perf_counter()
+            queued: Dict[str, Dict[str, Any]] = {}
+            for priority, _, _, waiter in self._queue:
+                if waiter.future.done():
+                    continue
+                entry = queued.setdefault(waiter.tenant, {"interactive": 0, "batch": 0, "oldest_wait_s": 0.0})
+                entry["batch" if priority == PRIORITY_BATCH else "interactive"] += 1
+                entry["oldest_wait_s"] = max(entry["oldest_wait_s"], round(now - waiter.enqueued_at, 3))
+
+            tenants = {}
+            for tenant, state in self._tenants.items():
+                tenants[tenant] = {
+                    "day": state.day,
+                    "used_tokens": state.used_tokens,
+                    "quota": state.quota,
+                    "weight": state.weight,
+                    "in_flight": state.in_flight,
+                    "completed": state.completed,
+                    "queued": queued.get(tenant, {"interactive": 0, "batch": 0, "oldest_wait_s": 0.0})
+                }
+            return {
+                "worker_pid": os.getpid(),
+                "max_concurrency": self.max_concurrency,
+                "running": self._running,
+                "queue_depth": sum(1 for *_, waiter in self._queue if not waiter.future.done()),
+                "tenants": tenants
+            }
+
+
+scheduler = LLMScheduler()
+
+# ============================================================================
+# KULLANIM KAYITLARI – MongoDB
+# ============================================================================
+
+async def load_usage() -> None:
+    # Başlangıçta bugünkü toplam kullanım (tüm worker'lar) yüklenir. Eşsiz dizin,
+    # worker'ların aynı anda yaptığı ilk upsert'lerin çift kayıt açmasını önler.
+    from database import llm_usage_collection
+
+    await llm_usage_collection.create_index([("tenant", 1), ("day", 1)], unique=True)
+    day = _today()
+    async for doc in llm_usage_collection.find({"day": day}):
+        scheduler.sync_usage(doc["tenant"], day, doc.get("tokens", 0))
+
+
+async def _increment_usage(collection, delta: Dict[str, Any]) -> Dict[str, Any]:
+    from pymongo import ReturnDocument
+    from pymongo.errors import DuplicateKeyError
+
+    for attempt in range(3):
+        try:
+            return await collection.find_one_and_update(
+                {"tenant": delta["tenant"], "day": delta["day"]},
+                {"$inc": {"tokens": delta["tokens"], "requests": delta["requests"]}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Başka bir worker kaydı aynı anda oluşturdu; tekrar denemede mevcut kayıt artırılır
+            if attempt == 2:
+                raise
+
+
+async def persist_usage() -> None:
+    from database import llm_usage_collection
+
+    deltas = scheduler.drain_usage()
+    for index, delta in enumerate(deltas):
+        try:
+            doc = await _increment_usage(llm_usage_collection, delta)
+        except Exception:
+            # Yazılamayan kullanım bir sonraki denemede tekrar gönderilir
+            for pending in deltas[index:]:
+                scheduler.restore_usage(pending)
+            raise
+        scheduler.sync_usage(delta["tenant"], delta["day"], doc["tokens"])
+
+
+# ============================================================================
+# WORKER DURUMLARI – MongoDB (çok worker'lı kurulumda birleşik görünüm)
+# ============================================================================
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def publish_worker_snapshot() -> None:
+    from database import llm_workers_collection
+
+    snapshot = scheduler.snapshot()
+    snapshot["worker_id"] = WORKER_ID
+    snapshot["updated_at"] = datetime.now(timezone.utc)
+    await llm_workers_collection.replace_one({"_id": WORKER_ID}, snapshot, upsert=True)
+
+
+async def load_cluster_snapshot(max_age_seconds: float) -> Dict[str, Any]:
+    # Son max_age_seconds içinde durum yayınlamış tüm worker'lar ve bugünkü toplam kullanım
+    from database import llm_usage_collection, llm_workers_collection
+
+    since = datetime.fromtimestamp(time.time() - max_age_seconds, tz=timezone.utc)
+    workers = [doc async for doc in llm_workers_collection.find({"updated_at": {"$gte": since}})]
+    usage = {
+        doc["tenant"]: {"tokens": doc.get("tokens", 0), "requests": doc.get("requests", 0)}
+        async for doc in llm_usage_collection.find({"day": _today()})
+    }
+
+    tenants: Dict[str, Dict[str, Any]] = {}
+    for worker in workers:
+        for tenant, info in worker.get("tenants", {}).items():
+            entry = tenants.setdefault(tenant, {"in_flight": 0, "queued_interactive": 0, "queued_batch": 0})
+            entry["in_flight"] += info["in_flight"]
+            entry["queued_interactive"] += info["queued"]["interactive"]
+            entry["queued_batch"] += info["queued"]["batch"]
+    for tenant, info in usage.items():
+        tenants.setdefault(tenant, {"in_flight": 0, "queued_interactive": 0, "queued_batch": 0}).update(
+            used_tokens=info["tokens"], requests=info["requests"]
+        )
+
+    return {
+        "workers": [
+            {k: w[k] for k in ("worker_id", "worker_pid", "running", "queue_depth", "max_concurrency", "updated_at")}
+            for w in workers
+        ],
+        "queue_depth": sum(w["queue_depth"] for w in workers),
+        "running": sum(w["running"] for w in workers),
+        "tenants": tenants
+    }
@@ -0,0 +1,75 @@
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from langchain_core.messages import AIMessage
+
+import ai_module
+import description_library
+from description_library import DescriptionLibrary, build_library, enumerate_option_space, partial_path
+from report_module import load_question_definitions
+
+
+class FlakyLLM:
+    # İlk çağrıda her üçüncü istek başarısız olur
+    def __init__(self, fail_every: int = 0):
+        self.fail_every = fail_every
+        self.prompts = []
+
+    def batch(self, prompts, config=None, return_exceptions=False):
+        results = []
+        for prompt in prompts:
+            self.prompts.append(prompt)
+            if self.fail_every and len(self.prompts) % self.fail_every == 0:
+                results.append(RuntimeError("oran sınırı"))
+            else:
+                results.append(AIMessage(content=f"açıklama {len(self.prompts)}",
+                                         usage_metadata={"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}))
+        return results
+
+
+def test_option_space_covers_only_described_responses():
+    triples = list(enumerate_option_space())
+    assert len(triples) == len(set(triples))
+    for category, subcategory, option in triples:
+        options = load_question_definitions()[category][subcategory]["options"]
+        assert option in options[:2] or option in options[-2:]
+
+
+def test_build_library_keeps_partial_progress_and_resumes(tmp_path, monkeypatch):
+    monkeypatch.setattr(description_library, "enumerate_option_space",
+                        lambda: iter(list(enumerate_option_space())[:10]))
+    path = str(tmp_path / "library.edl")
+
+    # Yeniden deneme yokken başarısız açıklamalar atlanır, başarılılar diske yazılır
+    first = FlakyLLM(fail_every=3)
+    monkeypatch.setattr(ai_module, "llm", first)
+    build_library(k=2, batch_size=7, max_concurrency=2, path=path, retries=0)
+    library = DescriptionLibrary(path)
+    assert library.meta["missing"] == 6
+    assert sum(library.variants(*triple) for triple in list(enumerate_option_space())[:10]) == 14
+    library.close()
+    assert os.path.exists(partial_path(path))
+
+    # İkinci çalıştırma yalnızca eksikleri üretir ve ilerleme dosyasını siler
+    second = FlakyLLM()
+    monkeypatch.setattr(ai_module, "llm", second)
+    build_library(k=2, batch_size=7, max_concurrency=2, path=path, retries=0)
+    assert len(second.prompts) == 6
+    library = DescriptionLibrary(path)
+    assert library.meta["missing"] == 0
+    assert all(library.variants(*triple) == 2 for triple in list(enumerate_option_space())[:10])
+    library.close()
+    assert not os.path.exists(partial_path(path))
+
+
+def test_build_library_retries_failed_items(tmp_path, monkeypatch):
+    monkeypatch.setattr(description_library, "enumerate_option_space",
+                        lambda: iter(list(enumerate_option_space())[:5]))
+    monkeypatch.setattr(ai_module, "llm", FlakyLLM(fail_every=4))
+    path = str(tmp_path / "library.edl")
+
+    build_library(k=2, batch_size=4, max_concurrency=2, path=path, retries=2)
+    library = DescriptionLibrary(path)
+    assert library.meta["missing"] == 0
+    library.close()
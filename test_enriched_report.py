@@ -0,0 +1,122 @@
+import asyncio
+import os
+import re
+import threading
+import time
+
+import httpx
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from langchain_core.messages import AIMessage
+
+import ai_module
+import api_main
+import auth
+from ai_module import ENRICHED_SECTIONS, generate_enriched_student_report_parallel
+from report_module import Assessment, Student, build_enriched_inputs
+from scheduler_module import scheduler
+
+SECTION_PATTERN = re.compile(r'yalnızca "([^"]+)" bölümünü')
+
+
+class SectionLLM:
+    # Bölüm adını geri döndürür; ilk bölümler daha geç biter (sıralamayı sınamak için)
+    def __init__(self):
+        self.prompts = []
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+            self.max_running = max(self.max_running, scheduler.snapshot()["running"])
+        match = SECTION_PATTERN.search(prompt)
+        if match:
+            index = [title for title, _, _ in ENRICHED_SECTIONS].index(match.group(1))
+            time.sleep(0.01 * (len(ENRICHED_SECTIONS) - index))
+            content = f"  {match.group(1)} içeriği  "
+        else:
+            content = "tek parça rapor"
+        return AIMessage(content=content, usage_metadata={"input_tokens": 0, "output_tokens": 0, "total_tokens": 10})
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    llm = SectionLLM()
+    monkeypatch.setattr(ai_module, "llm", llm)
+    return llm
+
+
+def make_student_and_assessment():
+    student = Student("S1", "Ada", "Y", "2015-01-01", "3", "8-9")
+    assessment = Assessment("A1", "S1", "Öğretmen", "sınıf öğretmeni", "2024-01-01")
+    return student, assessment
+
+
+def test_categories_map_to_enriched_fields():
+    student, assessment = make_student_and_assessment()
+    assessment.add_response("academic", "okuma", "akıcı")
+    assessment.add_response("academic", "matematik", "gelişiyor")
+    assessment.add_response("skills", "iletişim", "güçlü")
+    assessment.add_response("bilinmeyen", "x", "y")
+    student.learning_style = ["görsel"]
+
+    inputs = build_enriched_inputs(assessment, student)
+    assert inputs == {
+        "akademik_veri": "okuma: akıcı; matematik: gelişiyor; öğrenme stili: görsel",
+        "sosyal_veri": "Veri yok",
+        "beceri_veri": "iletişim: güçlü",
+        "kisisel_veri": "Veri yok",
+        "ilgi_veri": "Veri yok",
+    }
+
+    student.interests = ["müzik", "satranç"]
+    assert build_enriched_inputs(assessment, student)["ilgi_veri"] == "öğrenci ilgi alanları: müzik, satranç"
+
+
+def test_parallel_sections_are_stitched_in_order(fake_llm):
+    text = generate_enriched_student_report_parallel("a", "s", "b", "k", "i")
+
+    expected = "\n\n".join(
+        f"{index}) {title}\n{title} içeriği" for index, (title, _, _) in enumerate(ENRICHED_SECTIONS, start=1)
+    )
+    assert text == expected
+    assert len(fake_llm.prompts) == len(ENRICHED_SECTIONS)
+    # Bölüm odaklı bölümler yalnızca kendi verisini, genel bölümler tüm verileri alır
+    academic = next(p for p in fake_llm.prompts if '"Akademik Değerlendirme"' in p)
+    assert "- Akademik Performans: a" in academic and "Sosyal" not in academic.split("---")[-1]
+    summary = next(p for p in fake_llm.prompts if '"Genel Durum Özeti"' in p)
+    assert "- İlgi Alanları: i" in summary
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_enriched_endpoint_modes(fake_llm, monkeypatch, parallel):
+    monkeypatch.setattr(auth, "SECRET_KEY", "test")
+    token = auth.create_access_token({"sub": "ogretmen@okul.k12.tr"})
+    body = {
+        "name": "Ada", "surname": "Y", "birth_date": "2015-01-01", "grade": "3", "age_group": "8-9",
+        "interests": ["müzik"], "learning_style": [], "assessor_name": "Öğretmen", "assessor_role": "sınıf",
+        "responses": {"academic": {"okuma": "akıcı"}},
+        "parallel": parallel
+    }
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=api_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/student-enriched-report", json=body,
+                                     headers={"Authorization": f"Bearer {token}"})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200, response.text
+    content = response.json()["report"]["content"]
+    assert content["mode"] == ("parallel" if parallel else "single")
+    if parallel:
+        assert content["enriched_report"].startswith("1) Genel Durum Özeti")
+        assert len(fake_llm.prompts) == len(ENRICHED_SECTIONS)
+        # Yedi eşzamanlı çağrı zamanlayıcıda yedi yuva tutar
+        assert fake_llm.max_running == len(ENRICHED_SECTIONS)
+    else:
+        assert content["enriched_report"] == "tek parça rapor"
+        assert len(fake_llm.prompts) == 1
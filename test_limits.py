@@ -0,0 +1,211 @@
+import asyncio
+import json
+import os
+import tracemalloc
+
+import httpx
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import ai_module
+import api_main
+import auth
+from limits_module import (
+    MAX_BODY_BYTES, MAX_CATEGORIES, MAX_SUBCATEGORIES, MAX_LIST_ITEMS,
+    MAX_FIELD_LENGTH, MAX_ANSWER_LENGTH
+)
+
+# Worker başına aynı anda işlenebilecek istek sayısı (Starlette thread havuzu varsayılanı)
+# ve bu isteklerin toplam bellek bütçesi
+CONCURRENT_REQUESTS = int(os.getenv("MEMORY_TEST_CONCURRENCY", 40))
+WORKER_MEMORY_BUDGET_MB = float(os.getenv("WORKER_MEMORY_BUDGET_MB", 512))
+
+
+class FakeLLM:
+    # Ölçüm model çağrısı yapmaz; yanıt boyutu gerçekçi tutulur
+    def invoke(self, prompt):
+        from langchain_core.messages import AIMessage
+        return AIMessage(content="açıklama " * 100, usage_metadata={
+            "input_tokens": 0, "output_tokens": 0, "total_tokens": 0
+        })
+
+
+@pytest.fixture
+def client_headers(monkeypatch):
+    monkeypatch.setattr(ai_module, "llm", FakeLLM())
+    monkeypatch.setattr(auth, "SECRET_KEY", "test")
+    token = auth.create_access_token({"sub": "ogretmen@okul.k12.tr"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def worst_case_payload(answer_length: int = MAX_ANSWER_LENGTH) -> dict:
+    # Tüm alan sınırlarına dayanan istek (gövde sınırı ayrıca uygulanır)
+    field = "x" * MAX_FIELD_LENGTH
+    return {
+        "name": field, "surname": field, "birth_date": field, "grade": field, "age_group": field,
+        "interests": [field] * MAX_LIST_ITEMS,
+        "learning_style": [field] * MAX_LIST_ITEMS,
+        "assessor_name": field, "assessor_role": field,
+        "responses": {
+            f"c{c:0{MAX_FIELD_LENGTH - 1}d}"[:MAX_FIELD_LENGTH]: {
+                f"s{s:0{MAX_FIELD_LENGTH - 1}d}"[:MAX_FIELD_LENGTH]: "y" * answer_length
+                for s in range(MAX_SUBCATEGORIES)
+            }
+            for c in range(MAX_CATEGORIES)
+        }
+    }
+
+
+def body_within_limit() -> str:
+    # Gövde sınırına sığan en uzun yanıtlarla en kötü durum gövdesi
+    answer_length = MAX_ANSWER_LENGTH
+    while True:
+        body = json.dumps(worst_case_payload(answer_length))
+        if len(body) <= MAX_BODY_BYTES or answer_length == 0:
+            return body
+        answer_length = max(0, answer_length * MAX_BODY_BYTES // len(body) - 1)
+
+
+def traced_peak(scenario) -> int:
+    # İzleme gövde oluşturulmadan önce başlar; gövdenin kendisi de ölçüme dahildir
+    tracemalloc.start()
+    try:
+        asyncio.run(scenario())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def make_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=api_main.app), base_url="http://test")
+
+
+class BulkUpload:
+    # httpx.ASGITransport yanıtı tamamen biriktirir; akış davranışını ölçmek için
+    # uygulama doğrudan ASGI arayüzünden çağrılır ve yanıt satırları çözülüp atılır
+    def __init__(self, headers: dict, chunks, disconnect_after_body: bool = False):
+        self.headers = headers
+        self.chunks = list(chunks)
+        self.disconnect_after_body = disconnect_after_body
+        self.records = []
+        self._sent = 0
+
+    async def receive(self):
+        if self._sent < len(self.chunks):
+            self._sent += 1
+            return {"type": "http.request", "body": bytes(self.chunks[self._sent - 1]),
+                    "more_body": self._sent < len(self.chunks)}
+        if self.disconnect_after_body:
+            return {"type": "http.disconnect"}
+        # Bağlı istemci: gövde bittikten sonra yeni mesaj gelmez
+        await asyncio.Event().wait()
+
+    async def send(self, message):
+        if message["type"] == "http.response.body":
+            for raw in filter(None, message.get("body", b"").splitlines()):
+                record = json.loads(raw)
+                # Rapor gövdesi tutulmaz; ölçülen bellek istemci tarafında birikmesin
+                if "result" in record:
+                    record["result"] = True
+                self.records.append(record)
+
+    def lines(self):
+        return [record.get("line") for record in self.records]
+
+    async def __call__(self):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+            "method": "POST", "scheme": "http", "path": "/student-full-report/bulk", "raw_path": b"",
+            "root_path": "", "query_string": b"", "server": ("test", 80), "client": ("test", 1),
+            "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in self.headers.items()],
+        }
+        await api_main.app(scope, self.receive, self.send)
+
+
+def small_record(name: str = "Ada") -> bytes:
+    payload = {**worst_case_payload(answer_length=0), "name": name, "interests": [], "learning_style": [],
+               "responses": {}}
+    return json.dumps(payload).encode("utf-8") + b"\n"
+
+
+def test_worst_case_request_fits_worker_budget(client_headers):
+    text = body_within_limit()
+
+    async def scenario():
+        async with make_client() as client:
+            # Soketten okunan gövdeye karşılık gelen kopya izleme içinde oluşturulur
+            response = await client.post("/student-full-report", content=text.encode("utf-8"),
+                                         headers={**client_headers, "Content-Type": "application/json"})
+            assert response.status_code == 200, response.text
+
+    peak = traced_peak(scenario)
+    worst_case = peak * CONCURRENT_REQUESTS
+    assert worst_case <= WORKER_MEMORY_BUDGET_MB * 1024 * 1024, (
+        f"tek istek {peak / 2**20:.2f} MiB × {CONCURRENT_REQUESTS} = {worst_case / 2**20:.1f} MiB"
+    )
+
+
+def test_oversized_body_is_rejected_before_buffering(client_headers):
+    async def scenario():
+        async with make_client() as client:
+            response = await client.post("/student-full-report", content=b"x" * (MAX_BODY_BYTES * 8),
+                                         headers={**client_headers, "Content-Type": "application/json"})
+            assert response.status_code == 413
+
+    # Sınırı aşan gövde biriktirilmez; tepe, gönderilen gövdenin yanında küçük kalır
+    assert traced_peak(scenario) < MAX_BODY_BYTES * 8 + MAX_BODY_BYTES * 4
+
+
+def test_bulk_upload_memory_does_not_grow_with_record_count(client_headers):
+    line = json.dumps(worst_case_payload(answer_length=20)).encode("utf-8") + b"\n"
+
+    def bulk_peak(count: int) -> int:
+        app_call = BulkUpload(client_headers, [line] * count)
+        peak = traced_peak(app_call)
+        assert app_call.lines() == [i + 1 for i in range(count)]
+        return peak
+
+    small, large = bulk_peak(5), bulk_peak(50)
+    assert large < small * 1.5, f"5 kayıt {small / 2**20:.2f} MiB, 50 kayıt {large / 2**20:.2f} MiB"
+
+
+def test_bulk_record_failure_does_not_stop_stream(client_headers, monkeypatch):
+    build = api_main.build_full_report
+
+    def flaky(request):
+        if request.name == "hata":
+            raise RuntimeError("model bağlantısı koptu")
+        return build(request)
+
+    monkeypatch.setattr(api_main, "build_full_report", flaky)
+    upload = BulkUpload(client_headers, [small_record(), small_record("hata") + b"{bozuk\n" + small_record()])
+    asyncio.run(upload())
+
+    assert upload.lines() == [1, 2, 3, 4]
+    assert "result" in upload.records[0] and "result" in upload.records[3]
+    assert upload.records[1]["error"] == "RuntimeError: model bağlantısı koptu"
+    assert isinstance(upload.records[2]["error"], list)
+
+
+def test_bulk_stops_when_client_disconnects(client_headers, monkeypatch):
+    calls = []
+    monkeypatch.setattr(api_main, "build_full_report", lambda request: calls.append(request) or {})
+
+    # Tüm kayıtlar tek parçada gelir, ardından istemci ayrılır
+    upload = BulkUpload(client_headers, [small_record() * 5], disconnect_after_body=True)
+    asyncio.run(upload())
+    assert calls == []
+
+
+def test_early_rejection_carries_cors_headers(client_headers):
+    async def scenario():
+        async with make_client() as client:
+            return await client.post("/student-full-report", content=b"x" * (MAX_BODY_BYTES + 1),
+                                     headers={**client_headers, "Content-Type": "application/json",
+                                              "Origin": "https://ornek.framer.app"})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 413
+    assert "access-control-allow-origin" in response.headers
@@ -0,0 +1,199 @@
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from scheduler_module import (
+    LLMScheduler, QuotaExceededError, QueueTimeoutError,
+    PRIORITY_INTERACTIVE, PRIORITY_BATCH
+)
+
+
+def make_scheduler(**kwargs) -> LLMScheduler:
+    options = {"max_concurrency": 1, "default_quota": 0, "quotas": {}, "weights": {}, "queue_timeout": 5}
+    options.update(kwargs)
+    return LLMScheduler(**options)
+
+
+async def run_jobs(scheduler: LLMScheduler, jobs):
+    # İlk iş kapasiteyi tutar; diğerleri kuyruğa girdikten sonra bırakılır
+    order = []
+    await scheduler.acquire("hold", PRIORITY_INTERACTIVE, 1)
+
+    async def job(tenant, priority, tokens):
+        async with scheduler.admit(tokens, tenant=tenant, priority=priority):
+            order.append(tenant if priority == PRIORITY_INTERACTIVE else f"{tenant}:batch")
+            await asyncio.sleep(0)
+
+    tasks = []
+    for tenant, priority, tokens in jobs:
+        tasks.append(asyncio.create_task(job(tenant, priority, tokens)))
+        await asyncio.sleep(0)
+    scheduler.release("hold", 1)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_interactive_jobs_run_before_queued_batch_jobs():
+    scheduler = make_scheduler()
+    jobs = [("a", PRIORITY_BATCH, 100)] * 3 + [("b", PRIORITY_INTERACTIVE, 100)]
+    order = asyncio.run(run_jobs(scheduler, jobs))
+    assert order[0] == "b"
+    assert order[1:] == ["a:batch"] * 3
+
+
+def test_tenants_share_capacity_fairly():
+    scheduler = make_scheduler()
+    jobs = [("a", PRIORITY_INTERACTIVE, 100)] * 4 + [("b", PRIORITY_INTERACTIVE, 100)] * 2
+    order = asyncio.run(run_jobs(scheduler, jobs))
+    # b, a'nın tüm işlerinin bitmesini beklemez
+    assert order.index("b") < 2
+    assert order[:4].count("b") == 2
+
+
+def test_weight_gives_tenant_larger_share():
+    scheduler = make_scheduler(weights={"b": 4.0})
+    jobs = [("a", PRIORITY_INTERACTIVE, 100)] * 4 + [("b", PRIORITY_INTERACTIVE, 100)] * 4
+    order = asyncio.run(run_jobs(scheduler, jobs))
+    assert order[:5].count("b") == 4
+
+
+def test_quota_is_enforced_on_admission_and_per_call():
+    scheduler = make_scheduler(default_quota=1000)
+    scheduler.record_usage(1000, tenant="a")
+    with pytest.raises(QuotaExceededError):
+        asyncio.run(scheduler.acquire("a", PRIORITY_INTERACTIVE, 100))
+    with pytest.raises(QuotaExceededError):
+        scheduler.check_quota("a")
+    # Diğer kiracılar etkilenmez
+    scheduler.check_quota("b")
+
+
+def test_queue_timeout_releases_reservation():
+    scheduler = make_scheduler(queue_timeout=0.05)
+
+    async def scenario():
+        await scheduler.acquire("hold", PRIORITY_INTERACTIVE, 1)
+        with pytest.raises(QueueTimeoutError):
+            await scheduler.acquire("a", PRIORITY_INTERACTIVE, 100)
+        scheduler.release("hold", 1)
+        # Zaman aşımına uğrayan bekleyen kapasiteyi tutmaz
+        await scheduler.acquire("b", PRIORITY_INTERACTIVE, 100)
+        scheduler.release("b", 100)
+
+    asyncio.run(scenario())
+    snapshot = scheduler.snapshot()
+    assert snapshot["running"] == 0
+    assert snapshot["queue_depth"] == 0
+    assert scheduler._tenants["a"].reserved_tokens == 0
+
+
+def test_usage_drain_restore_and_sync():
+    scheduler = make_scheduler()
+    scheduler.record_usage(300, tenant="a")
+    deltas = scheduler.drain_usage()
+    assert [(d["tenant"], d["tokens"], d["requests"]) for d in deltas] == [("a", 300, 1)]
+    assert scheduler.drain_usage() == []
+
+    # Yazılamayan kullanım geri konur ve bir sonraki seferde yeniden gönderilir
+    scheduler.restore_usage(deltas[0])
+    assert scheduler.drain_usage()[0]["tokens"] == 300
+
+    # Mongo'dan gelen toplam (diğer worker'lar dahil) yerel sayacın yerini alır
+    scheduler.sync_usage("a", deltas[0]["day"], 5000)
+    assert scheduler.snapshot()["tenants"]["a"]["used_tokens"] == 5000
+
+
+def test_llm_routes_require_token():
+    from fastapi.testclient import TestClient
+    import api_main
+
+    client = TestClient(api_main.app)
+    body = {"ders_adı": "x", "guclu_yonler": "y", "gelisim_alanlari": "z", "oneriler": "w"}
+    assert client.post("/generate-report", json=body).status_code == 401
+    assert client.post("/generate-report", json=body, headers={"Authorization": "Bearer bozuk"}).status_code == 401
+    assert client.get("/admin/llm-usage").status_code == 403
+
+
+def test_job_is_charged_only_for_its_own_tokens():
+    scheduler = make_scheduler(max_concurrency=4)
+
+    async def job(tokens):
+        async with scheduler.admit(100, tenant="a"):
+            await asyncio.sleep(0)
+            scheduler.record_usage(tokens)
+            await asyncio.sleep(0)
+
+    async def scenario():
+        await asyncio.gather(*(job(100) for _ in range(4)))
+        # Diğer worker'ların kullanımı iş sürerken eşitlenir
+        async with scheduler.admit(100, tenant="a"):
+            scheduler.sync_usage("a", scheduler._tenants["a"].day, 1_000_000)
+            scheduler.record_usage(100)
+
+    asyncio.run(scenario())
+    assert scheduler._tenants["a"].last_finish == 500
+
+
+def test_admitted_job_is_not_rejected_by_its_own_reservation():
+    scheduler = make_scheduler(default_quota=10000)
+    scheduler.record_usage(8500, tenant="a")
+
+    async def scenario():
+        async with scheduler.admit(2000, tenant="a"):
+            scheduler.check_quota("a")
+            # Diğer işlerin rezervasyonları sayılmaya devam eder
+            with pytest.raises(QuotaExceededError):
+                await scheduler.acquire("a", PRIORITY_INTERACTIVE, 2000)
+
+    asyncio.run(scenario())
+
+
+def test_persist_usage_retries_duplicate_key(monkeypatch):
+    from pymongo.errors import DuplicateKeyError
+    import database
+    import scheduler_module
+
+    class Collection:
+        calls = 0
+
+        async def find_one_and_update(self, query, update, upsert, return_document):
+            Collection.calls += 1
+            if Collection.calls == 1:
+                raise DuplicateKeyError("E11000")
+            return {**query, "tokens": 700}
+
+    monkeypatch.setattr(database, "llm_usage_collection", Collection())
+    monkeypatch.setattr(scheduler_module, "scheduler", make_scheduler())
+    scheduler_module.scheduler.record_usage(300, tenant="a")
+    asyncio.run(scheduler_module.persist_usage())
+    assert Collection.calls == 2
+    assert scheduler_module.scheduler.snapshot()["tenants"]["a"]["used_tokens"] == 700
+
+
+def test_multi_slot_job_waits_for_capacity_and_is_not_starved():
+    scheduler = make_scheduler(max_concurrency=4)
+
+    async def scenario():
+        order = []
+        await scheduler.acquire("hold", PRIORITY_INTERACTIVE, 1)
+
+        async def job(name, slots):
+            async with scheduler.admit(100, tenant=name, slots=slots):
+                order.append((name, scheduler.snapshot()["running"]))
+                await asyncio.sleep(0.01)
+
+        big = asyncio.create_task(job("big", 4))
+        await asyncio.sleep(0)
+        # Sonra gelen tek yuvalı iş boşta yer olsa da sıradaki çok yuvalı işi geçmez
+        small = asyncio.create_task(job("small", 1))
+        await asyncio.sleep(0)
+        assert order == []
+        scheduler.release("hold", 1)
+        await asyncio.gather(big, small)
+        return order
+
+    assert asyncio.run(scenario()) == [("big", 4), ("small", 1)]
+    assert scheduler.snapshot()["running"] == 0